@@ -3,17 +3,22 @@
 #----------------------------------------------------------------------------#
 
 import json
+import time
+import functools
 import dateutil.parser
 import babel
-from flask import Flask, render_template, request, Response, flash, redirect, url_for
+import babel.dates
+from flask import Flask, render_template, request, Response, flash, redirect, url_for, abort, session, jsonify
 from flask_moment import Moment
-from flask_sqlalchemy import SQLAlchemy
 import logging
 from logging import Formatter, FileHandler
 from flask_wtf import Form
 from forms import *
 from flask_migrate import Migrate
 from datetime import date,datetime
+from search import FuzzySearch
+from page_cache import PageCache
+from database import pool_metrics, RoutingSQLAlchemy
 #----------------------------------------------------------------------------#
 # App Config.
 #----------------------------------------------------------------------------#
@@ -21,7 +26,10 @@ from datetime import date,datetime
 app = Flask(__name__)
 moment = Moment(app)
 app.config.from_object('config')
-db = SQLAlchemy(app)
+# db.session is scoped to the request, Flask-SQLAlchemy rolls back anything
+# left uncommitted and returns its connection to the pool when it ends. It
+# reads from a replica in the views marked with @replica_reads
+db = RoutingSQLAlchemy(app)
 
 # (DONE) TODO: connect to a local postgresql database
 
@@ -31,6 +39,26 @@ migrate=Migrate(app,db)
 # Models.
 #----------------------------------------------------------------------------#
 
+class Genre(db.Model):
+    __tablename__ = 'Genre'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(120), nullable=False, unique=True)
+
+# the primary keys index the genres of a venue or artist, the second indexes
+# the venues or artists of a genre for the genre filters
+venue_genres = db.Table('venue_genres',
+    db.Column('venue_id', db.Integer, db.ForeignKey('Venue.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_venue_genres_genre_id_venue_id', 'genre_id', 'venue_id'),
+)
+
+artist_genres = db.Table('artist_genres',
+    db.Column('artist_id', db.Integer, db.ForeignKey('Artist.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('genre_id', db.Integer, db.ForeignKey('Genre.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_artist_genres_genre_id_artist_id', 'genre_id', 'artist_id'),
+)
+
 class Venue(db.Model):
     __tablename__ = 'Venue'
 
@@ -44,12 +72,15 @@ class Venue(db.Model):
     facebook_link = db.Column(db.String(120))
 
     # (DONE) TODO: implement any missing fields, as a database migration using Flask-Migrate
-    genres = db.Column(db.String)
+    genres = db.relationship('Genre', secondary=venue_genres, order_by=Genre.name)
     website = db.Column(db.String)
     seeking_talent = db.Column(db.Boolean)
     seeking_description = db.Column(db.String)
     shows=db.relationship('Show', backref='venue', lazy=True)
 
+    # version stamp of the cached page, bumped on every change shown on it
+    cache_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 class Artist(db.Model):
     __tablename__ = 'Artist'
 
@@ -58,7 +89,7 @@ class Artist(db.Model):
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
-    genres = db.Column(db.String(120))
+    genres = db.relationship('Genre', secondary=artist_genres, order_by=Genre.name)
     image_link = db.Column(db.String(500))
     facebook_link = db.Column(db.String(120))
 
@@ -68,6 +99,9 @@ class Artist(db.Model):
     seeking_description = db.Column(db.String)
     shows=db.relationship('Show', backref='artist', lazy=True)
 
+    # version stamp of the cached page, bumped on every change shown on it
+    cache_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
 
 
 # (DONE) TODO Implement Show and Artist models, and complete all model relationships and properties, as a database migration.
@@ -79,25 +113,300 @@ class Show(db.Model):
     starttime = db.Column(db.DateTime)
     venue_id = db.Column(db.Integer, db.ForeignKey('Venue.id'))
     artist_id = db.Column(db.Integer, db.ForeignKey('Artist.id'))
+
+    __table_args__ = (
+        db.Index('ix_Show_venue_id_starttime', 'venue_id', 'starttime'),
+        db.Index('ix_Show_artist_id_starttime', 'artist_id', 'starttime'),
+    )
+
+# Read model of the shows listing and of the venue and artist pages, one row
+# per show with the names and images of its venue and artist. It is kept up to
+# date by the listeners below, in the transaction of the write.
+
+class ShowCard(db.Model):
+    __tablename__ = 'show_cards'
+
+    show_id = db.Column(db.Integer, db.ForeignKey('Show.id', ondelete='CASCADE'), primary_key=True)
+    starttime = db.Column(db.DateTime)
+    venue_id = db.Column(db.Integer)
     venue_name = db.Column(db.String)
+    venue_image_link = db.Column(db.String(500))
+    artist_id = db.Column(db.Integer)
     artist_name = db.Column(db.String)
     artist_image_link = db.Column(db.String(500))
-    venue_image_link = db.Column(db.String(500))
+
+    __table_args__ = (
+        db.Index('ix_show_cards_starttime_show_id', 'starttime', 'show_id'),
+        db.Index('ix_show_cards_venue_id_starttime', 'venue_id', 'starttime'),
+        db.Index('ix_show_cards_artist_id_starttime', 'artist_id', 'starttime'),
+    )
+
+INSERT_SHOW_CARD = db.text('''
+  INSERT INTO show_cards (show_id, starttime, venue_id, venue_name, venue_image_link,
+                          artist_id, artist_name, artist_image_link)
+  SELECT "Show".id, "Show".starttime, "Show".venue_id, "Venue".name, "Venue".image_link,
+         "Show".artist_id, "Artist".name, "Artist".image_link
+  FROM "Show"
+  LEFT JOIN "Venue" ON "Venue".id = "Show".venue_id
+  LEFT JOIN "Artist" ON "Artist".id = "Show".artist_id
+  WHERE "Show".id = :id
+''')
+
+DELETE_SHOW_CARD = db.text('DELETE FROM show_cards WHERE show_id = :id')
+
+UPDATE_VENUE_CARDS = db.text('''
+  UPDATE show_cards SET venue_name = :name, venue_image_link = :image_link
+  WHERE venue_id = :id
+''')
+
+UPDATE_ARTIST_CARDS = db.text('''
+  UPDATE show_cards SET artist_name = :name, artist_image_link = :image_link
+  WHERE artist_id = :id
+''')
+
+# the pages showing a show are the ones of its venue and artist, before and
+# after the change
+BUMP_VENUE_PAGES = db.text('UPDATE "Venue" SET cache_version = cache_version + 1 WHERE id IN :ids')\
+  .bindparams(db.bindparam('ids', expanding=True))
+
+BUMP_ARTIST_PAGES = db.text('UPDATE "Artist" SET cache_version = cache_version + 1 WHERE id IN :ids')\
+  .bindparams(db.bindparam('ids', expanding=True))
+
+def bump_show_pages(connection, show):
+  state=db.inspect(show)
+  for statement,attribute in ((BUMP_VENUE_PAGES,'venue_id'),(BUMP_ARTIST_PAGES,'artist_id')):
+    history=state.attrs[attribute].history
+    ids=set(history.added or ())|set(history.deleted or ())|set(history.unchanged or ())
+    ids.discard(None)
+    if ids:
+      connection.execute(statement, {"ids": list(ids)})
+
+@db.event.listens_for(Show, 'after_insert')
+@db.event.listens_for(Show, 'after_update')
+def refresh_show_card(mapper, connection, show):
+  connection.execute(DELETE_SHOW_CARD, {"id": show.id})
+  connection.execute(INSERT_SHOW_CARD, {"id": show.id})
+  bump_show_pages(connection, show)
+
+@db.event.listens_for(Show, 'after_delete')
+def delete_show_card(mapper, connection, show):
+  connection.execute(DELETE_SHOW_CARD, {"id": show.id})
+  bump_show_pages(connection, show)
+
+@db.event.listens_for(Venue, 'before_update')
+@db.event.listens_for(Artist, 'before_update')
+def bump_page_version(mapper, connection, target):
+  # incremented in SQL, the stamp may have been bumped by the statements above
+  # since the object was loaded
+  target.cache_version=type(target).cache_version+1
+
+def card_fields_changed(target):
+  state=db.inspect(target)
+  return state.attrs.name.history.has_changes() or state.attrs.image_link.history.has_changes()
+
+BUMP_VENUE_ARTIST_PAGES = db.text('''
+  UPDATE "Artist" SET cache_version = cache_version + 1
+  WHERE id IN (SELECT artist_id FROM show_cards WHERE venue_id = :id)
+''')
+
+BUMP_ARTIST_VENUE_PAGES = db.text('''
+  UPDATE "Venue" SET cache_version = cache_version + 1
+  WHERE id IN (SELECT venue_id FROM show_cards WHERE artist_id = :id)
+''')
+
+@db.event.listens_for(Venue, 'after_update')
+def refresh_venue_cards(mapper, connection, venue):
+  if card_fields_changed(venue):
+    connection.execute(UPDATE_VENUE_CARDS, {"id": venue.id, "name": venue.name, "image_link": venue.image_link})
+    # the pages of the artists who played there show the venue's card too
+    connection.execute(BUMP_VENUE_ARTIST_PAGES, {"id": venue.id})
+
+@db.event.listens_for(Artist, 'after_update')
+def refresh_artist_cards(mapper, connection, artist):
+  if card_fields_changed(artist):
+    connection.execute(UPDATE_ARTIST_CARDS, {"id": artist.id, "name": artist.name, "image_link": artist.image_link})
+    connection.execute(BUMP_ARTIST_VENUE_PAGES, {"id": artist.id})
 
 #----------------------------------------------------------------------------#
 # Filters.
 #----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-  date = dateutil.parser.parse(value)
-  if format == 'full':
-      format="EEEE MMMM, d, y 'at' h:mma"
-  elif format == 'medium':
-      format="EE MM, dd, y h:mma"
-  return babel.dates.format_datetime(date, format)
+DATETIME_FORMATS = {
+  'full': "EEEE MMMM, d, y 'at' h:mma",
+  'medium': "EE MM, dd, y h:mma",
+}
+
+# Babel's named formats left to babel.dates.format_datetime, which joins the
+# locale's date and time formats
+BABEL_DATETIME_FORMATS = ('short', 'long')
+
+@functools.lru_cache(maxsize=64)
+def datetime_pattern(format, locale):
+  # the parsed Babel pattern and locale, parsed once per format and locale
+  return babel.dates.parse_pattern(DATETIME_FORMATS.get(format, format)), babel.Locale.parse(locale)
+
+# a page lists the same show times many times, and pages are rendered again
+# and again, so recent results are kept too
+@functools.lru_cache(maxsize=4096)
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+  date = value if isinstance(value, datetime) else dateutil.parser.parse(value)
+  if format in BABEL_DATETIME_FORMATS:
+    return babel.dates.format_datetime(date, format, locale=locale)
+  pattern, locale = datetime_pattern(format, locale)
+  return pattern.apply(date, locale)
 
 app.jinja_env.filters['datetime'] = format_datetime
 
+#----------------------------------------------------------------------------#
+# Helpers.
+#----------------------------------------------------------------------------#
+
+def genres_named(names):
+  # the Genre rows of `names`, creating the missing ones
+  names=set(name.strip() for name in names if name.strip())
+  if not names:
+    return []
+  genres=Genre.query.filter(Genre.name.in_(names)).all()
+  known=set(genre.name for genre in genres)
+  return genres+[Genre(name=name) for name in sorted(names-known)]
+
+GENRE_COLUMNS={Venue: venue_genres.c.venue_id, Artist: artist_genres.c.artist_id}
+
+def with_genre(query, model, genre):
+  # restricts `query` to the venues or artists of the genre named `genre`,
+  # through the (genre_id, entity id) index of the association table
+  if not genre:
+    return query
+  genre_column=GENRE_COLUMNS[model]
+  members=db.session.query(genre_column).join(Genre, Genre.id==genre_column.table.c.genre_id).filter(Genre.name==genre)
+  return query.filter(model.id.in_(members))
+
+fuzzy_search={
+  model: FuzzySearch(db, model, genre_column, Genre, ttl=app.config['SEARCH_INDEX_TTL'])
+  for model,genre_column in GENRE_COLUMNS.items()
+}
+
+def search_by_name(model, show_column, search_term, page, mode='name', genre=None):
+  # one page of the matches with their number of upcoming shows, and the
+  # total number of matches. `name` mode matches names containing the term,
+  # `fuzzy` mode ranks names, locations and genres by similarity to it
+  per_page=app.config['SEARCH_RESULTS_PER_PAGE']
+  offset=(page-1)*per_page
+  if mode=='fuzzy':
+    count,ids=fuzzy_search[model].search(search_term, offset, per_page, genre)
+  else:
+    matches=db.session.query(model.id).filter(model.name.ilike("%"+search_term+"%"))
+    matches=with_genre(matches, model, genre)
+    count=matches.count()
+    ids=[i for (i,) in matches.order_by(model.name,model.id).limit(per_page).offset(offset)]
+
+  # upcoming shows counted by one grouped join on that page only
+  rows=db.session.query(model.id,model.name,db.func.count(Show.id))\
+    .filter(model.id.in_(ids))\
+    .outerjoin(Show,db.and_(show_column==model.id,Show.starttime>datetime.now()))\
+    .group_by(model.id,model.name)
+  found={i:{"id":i,"name":name,"num_upcoming_shows":num_upcoming_shows} for i,name,num_upcoming_shows in rows}
+
+  return {
+    "count": count,
+    "page": page,
+    "mode": mode,
+    "genre": genre,
+    "has_prev": page>1,
+    "has_next": page*per_page<count,
+    "data": [found[i] for i in ids if i in found]
+  }
+
+def with_shows(model, entity_id, card_column, card_columns):
+  # the venue or artist `entity_id` with its show cards in a single query,
+  # past shows first and each part ordered by start time, and its genres in
+  # a second one so that they don't multiply the show rows. Shows are split
+  # against one `now`, and a window over that split counts them
+  now=datetime.now()
+  upcoming=(ShowCard.starttime>now)
+  shows=db.session.query(ShowCard.show_id,ShowCard.starttime.label('start_time'),*card_columns,
+    upcoming.label('upcoming'),db.func.count(ShowCard.show_id).over(partition_by=upcoming).label('show_count'))\
+    .filter(card_column==entity_id)\
+    .subquery()
+  rows=db.session.query(model,shows)\
+    .outerjoin(shows,db.true())\
+    .options(db.selectinload(model.genres))\
+    .filter(model.id==entity_id)\
+    .order_by(shows.c.upcoming,shows.c.start_time)
+
+  fields=[column.key for column in card_columns]+['start_time']
+  entity=None
+  partitions={False:[], True:[]}
+  counts={False:0, True:0}
+  for row in rows:
+    entity=row[0]
+    if row.show_id is None:
+      continue
+    counts[bool(row.upcoming)]=row.show_count
+    partitions[bool(row.upcoming)].append({field:getattr(row,field) for field in fields})
+
+  if entity is None:
+    abort(404)
+  return entity,partitions,counts
+
+page_cache=PageCache(maxsize=app.config['PAGE_CACHE_SIZE'], directory=app.config['PAGE_CACHE_DIR'])
+
+def cached_page(kind, model, entity_id, render):
+  # the page of the venue or artist `entity_id`, from the cache when it was
+  # rendered at the current version stamp. `render` returns the page and the
+  # time it expires at, the start of the next upcoming show. The stamp comes
+  # from the primary, a lagging replica would return an older one and the
+  # older page would be cached under it again
+  version=db.session.execute(db.select([model.cache_version]).where(model.id==entity_id), bind=db.engine).scalar()
+  if version is None:
+    abort(404)
+
+  # pages carrying flashed messages are rendered for that request only
+  if '_flashes' in session:
+    return render()[0]
+
+  key='%s-%d' % (kind, entity_id)
+  body=page_cache.get(key, version)
+  if body is None:
+    # rendered from the replica only once it has caught up with that stamp
+    if db.replica() is not None and \
+        db.session.query(model.cache_version).filter(model.id==entity_id).scalar()!=version:
+      db.read_from_primary()
+    body,expires_at=render()
+    page_cache.put(key, version, body, expires_at)
+  return body
+
+def next_show_time(shows):
+  return shows[True][0]['start_time'] if shows[True] else None
+
+# replica routing, a client whose request committed a write gets the
+# primary for the next REPLICA_STICKY_SECONDS, remembered in a cookie as it
+# only ever costs a primary read
+PRIMARY_UNTIL_COOKIE='fyyur_primary_until'
+
+def replica_reads(view):
+  # marks a view that only reads, its queries go to a replica
+  view.replica_reads=True
+  return view
+
+def reads_from_primary():
+  try:
+    return float(request.cookies.get(PRIMARY_UNTIL_COOKIE, 0))>time.time()
+  except ValueError:
+    return False
+
+@app.before_request
+def route_reads():
+  view=app.view_functions.get(request.endpoint)
+  db.route_reads(getattr(view, 'replica_reads', False) and not reads_from_primary())
+
+@app.after_request
+def stick_to_primary(response):
+  if db.committed_writes():
+    sticky=app.config['REPLICA_STICKY_SECONDS']
+    response.set_cookie(PRIMARY_UNTIL_COOKIE, '%.3f' % (time.time()+sticky), max_age=sticky, httponly=True)
+  return response
+
 #----------------------------------------------------------------------------#
 # Controllers.
 #----------------------------------------------------------------------------#
@@ -111,58 +420,59 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@replica_reads
 def venues():
   # (DONE)TODO: replace with real venues data.
   #       num_shows should be aggregated based on number of upcoming shows per venue.
-  
-  venuedata=db.session.query(Venue)
-  data=[]
-  for i in venuedata:
-    flag=False
-    for j in data:
-      if j['city']==i.city and j['state']==i.state:
-        index = data.index(j)
-        data[index]['venues'].append({"id":i.id,"name":i.name,"num_upcoming_shows":0})
-        flag=True
-        break
 
-    if flag==False:
-      data.append({"city":i.city,"state":i.state,"venues":[{"id":i.id,"name":i.name,"num_upcoming_shows":0}]})
-
-
-  return render_template('pages/venues.html', areas=data)
+  # one grouped query, the upcoming condition is part of the join so that
+  # venues without upcoming shows are still listed with a count of 0
+  upcoming_shows=db.func.count(Show.id)
+  venuedata=db.session.query(Venue.id,Venue.name,Venue.city,Venue.state,upcoming_shows)\
+    .outerjoin(Show,db.and_(Show.venue_id==Venue.id,Show.starttime>datetime.now()))\
+    .group_by(Venue.id)\
+    .order_by(Venue.state,Venue.city,Venue.name)
+  genre=request.args.get('genre')
+  venuedata=with_genre(venuedata, Venue, genre)
+
+  areas={}
+  for venue_id,name,city,state,num_upcoming_shows in venuedata:
+    area=areas.get((city,state))
+    if area is None:
+      area=areas[(city,state)]={"city":city,"state":state,"venues":[]}
+    area['venues'].append({"id":venue_id,"name":name,"num_upcoming_shows":num_upcoming_shows})
+
+  return render_template('pages/venues.html', areas=list(areas.values()), genre=genre, genres=Genre.query.order_by(Genre.name))
 
 @app.route('/venues/search', methods=['POST'])
+@replica_reads
 def search_venues():
   # (DONE)TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for Hop should return "The Musical Hop".
   # search for "Music" should return "The Musical Hop" and "Park Square Live Music & Coffee"
-  search_term=request.form.get('search_term')
-  venues=db.session.query(Venue).filter(Venue.name.ilike("%"+search_term+"%")).all()
-  response={
-    "count": len(venues),
-    "data": []
-  }
-
-  for i in venues:
-    response['data'].append({
-      "id": i.id,
-      "name": i.name,
-      "num_upcoming_shows": 0,
-    })
-  return render_template('pages/search_venues.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term=request.form.get('search_term', '')
+  page=max(request.form.get('page', 1, type=int), 1)
+  mode=request.form.get('mode', app.config['SEARCH_MODE'])
+  genre=request.form.get('genre')
+  response=search_by_name(Venue, Show.venue_id, search_term, page, mode, genre)
+  return render_template('pages/search_venues.html', results=response, search_term=search_term)
 
 @app.route('/venues/<int:venue_id>')
+@replica_reads
 def show_venue(venue_id):
   
   # shows the venue page with the given venue_id
   # (DONE)TODO: replace with real venue data from the venues table, using venue_id
   
-  venuedata=Venue.query.filter_by(id=venue_id).first()
+  return cached_page('venue', Venue, venue_id, lambda: render_venue(venue_id))
+
+def render_venue(venue_id):
+  venuedata,shows,counts=with_shows(Venue, venue_id, ShowCard.venue_id,
+    [ShowCard.artist_id, ShowCard.artist_name, ShowCard.artist_image_link])
   data={
     "id": venuedata.id,
     "name": venuedata.name,
-    "genres": venuedata.genres[1:len(venuedata.genres)-1].split(","),
+    "genres": [genre.name for genre in venuedata.genres],
     "address": venuedata.address,
     "city": venuedata.city,
     "state": venuedata.state,
@@ -172,34 +482,13 @@ def show_venue(venue_id):
     "seeking_talent": venuedata.seeking_talent,
     "seeking_description": venuedata.seeking_description,
     "image_link": venuedata.image_link,
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
+    "past_shows": shows[False],
+    "upcoming_shows": shows[True],
+    "past_shows_count": counts[False],
+    "upcoming_shows_count": counts[True],
   }
 
-  showsdata=db.session.query(Venue,Show).filter_by(id=venue_id).join(Show).all()
-
-  for i in showsdata:
-    if i.Show.starttime<= datetime.now():
-      data['past_shows'].append({
-        "artist_id": i.Show.artist_id,
-        "artist_name": i.Show.artist_name,
-        "artist_image_link": i.Show.artist_image_link,
-        "start_time": i.Show.starttime.strftime("%Y-%m-%d %H:%M:%S")
-      })
-    else:
-      data['upcoming_shows'].append({
-        "artist_id": i.Show.artist_id,
-        "artist_name": i.Show.artist_name,
-        "artist_image_link": i.Show.artist_image_link,
-        "start_time": i.Show.starttime.strftime("%Y-%m-%d %H:%M:%S")
-      })
-
-  data['past_shows_count']=len(data['past_shows'])
-  data['upcoming_shows_count']=len(data['upcoming_shows'])
-
-  return render_template('pages/show_venue.html', venue=data)
+  return render_template('pages/show_venue.html', venue=data), next_show_time(shows)
 
 #  Create Venue
 #  ----------------------------------------------------------------
@@ -220,7 +509,7 @@ def create_venue_submission():
     state = request.form.get('state')
     address = request.form.get('address')
     phone = request.form.get('phone')
-    genres = request.form.getlist('genres')
+    genres = genres_named(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link')
     venue=Venue(
       name=name,
@@ -240,8 +529,6 @@ def create_venue_submission():
     #(DONE) TODO: on unsuccessful db insert, flash an error instead.
     flash('An error occurred. Venue ' + request.form.get('name') + ' could not be listed.')
     db.session.rollback()
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
 @app.route('/venues/<venue_id>', methods=['DELETE'])
@@ -256,46 +543,45 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@replica_reads
 def artists():
   #(DONE) TODO: replace with real data returned from querying the database
   
-  artistdata=db.session.query(Artist)
+  genre=request.args.get('genre')
+  artistdata=with_genre(db.session.query(Artist.id,Artist.name), Artist, genre)
   data=[]
   for i in artistdata:
       data.append({"id":i.id,"name":i.name})
       
-  return render_template('pages/artists.html', artists=data)
+  return render_template('pages/artists.html', artists=data, genre=genre, genres=Genre.query.order_by(Genre.name))
 
 @app.route('/artists/search', methods=['POST'])
+@replica_reads
 def search_artists():
   # (DONE}TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
   # seach for "A" should return "Guns N Petals", "Matt Quevado", and "The Wild Sax Band".
   # search for "band" should return "The Wild Sax Band".
-  search_term=request.form.get('search_term')
-  artists=db.session.query(Artist).filter(Artist.name.ilike("%"+search_term+"%")).all()
-  response={
-    "count": len(artists),
-    "data": []
-  }
-
-  for i in artists:
-    response['data'].append({
-      "id": i.id,
-      "name": i.name,
-      "num_upcoming_shows": 0,
-    })
-
-  return render_template('pages/search_artists.html', results=response, search_term=request.form.get('search_term', ''))
+  search_term=request.form.get('search_term', '')
+  page=max(request.form.get('page', 1, type=int), 1)
+  mode=request.form.get('mode', app.config['SEARCH_MODE'])
+  genre=request.form.get('genre')
+  response=search_by_name(Artist, Show.artist_id, search_term, page, mode, genre)
+  return render_template('pages/search_artists.html', results=response, search_term=search_term)
 
 @app.route('/artists/<int:artist_id>')
+@replica_reads
 def show_artist(artist_id):
   # shows the artist page with the given venue_id
   # (DONE)TODO: replace with real artist data from the artist table, using artist_id
-  artistdata=db.session.query(Artist).filter_by(id=artist_id).first()
+  return cached_page('artist', Artist, artist_id, lambda: render_artist(artist_id))
+
+def render_artist(artist_id):
+  artistdata,shows,counts=with_shows(Artist, artist_id, ShowCard.artist_id,
+    [ShowCard.venue_id, ShowCard.venue_name, ShowCard.venue_image_link])
   data={
     "id": artistdata.id,
     "name": artistdata.name,
-    "genres": artistdata.genres[1:len(artistdata.genres)-1].split(","),
+    "genres": [genre.name for genre in artistdata.genres],
     "city": artistdata.city,
     "state": artistdata.state,
     "phone": artistdata.phone,
@@ -304,34 +590,13 @@ def show_artist(artist_id):
     "seeking_venue": artistdata.seeking_venue,
     "seeking_description": artistdata.seeking_description,
     "image_link": artistdata.image_link,
-    "past_shows": [],
-    "upcoming_shows": [],
-    "past_shows_count": 0,
-    "upcoming_shows_count": 0,
+    "past_shows": shows[False],
+    "upcoming_shows": shows[True],
+    "past_shows_count": counts[False],
+    "upcoming_shows_count": counts[True],
   }
 
-  showsdata=db.session.query(Artist,Show).filter_by(id=artist_id).join(Show).all()
-  for i in showsdata:
-    if i.Show.starttime<= datetime.now():
-      data['past_shows'].append({
-        "venue_id": i.Show.venue_id,
-        "venue_name": i.Show.venue_name,
-        "venue_image_link": i.Show.venue_image_link,
-        "start_time": i.Show.starttime.strftime("%Y-%m-%d %H:%M:%S")
-      })
-    else:
-      data['upcoming_shows'].append({
-        "venue_id": i.Show.venue_id,
-        "venue_name": i.Show.venue_name,
-        "venue_image_link": i.Show.venue_image_link,
-        "start_time": i.Show.starttime.strftime("%Y-%m-%d %H:%M:%S")
-      })
-      print(data['upcoming_shows'][0]['venue_name'])
-
-  data['past_shows_count']=len(data['past_shows'])
-  data['upcoming_shows_count']=len(data['upcoming_shows'])
-
-  return render_template('pages/show_artist.html', artist=data)
+  return render_template('pages/show_artist.html', artist=data), next_show_time(shows)
 
 
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
@@ -404,7 +669,7 @@ def create_artist_submission():
     city = request.form.get('city')
     state = request.form.get('state')
     phone = request.form.get('phone')
-    genres = request.form.getlist('genres')
+    genres = genres_named(request.form.getlist('genres'))
     facebook_link = request.form.get('facebook_link')
     artist=Artist(
       name=name,
@@ -423,8 +688,6 @@ def create_artist_submission():
     #(DONE) TODO: on unsuccessful db insert, flash an error instead.
     flash('An error occurred. Artist ' + request.form.get('name') + ' could not be listed.')
     db.session.rollback()
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
 
@@ -432,22 +695,55 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@replica_reads
 def shows():
   # displays list of shows at /shows
   # (DONE)TODO: replace with real shows data.
-  showdata=db.session.query(Show)
+  # upcoming shows by default, `start`/`end` select another date range and
+  # `cursor`, the start time and id of the last show of the previous page,
+  # continues the listing through the (starttime, show_id) index
+  try:
+    start=dateutil.parser.parse(request.args['start']) if request.args.get('start') else datetime.now()
+    end=dateutil.parser.parse(request.args['end']) if request.args.get('end') else None
+    cursor=request.args.get('cursor')
+    if cursor:
+      cursor_time,cursor_id=cursor.rsplit('_',1)
+      cursor=(dateutil.parser.parse(cursor_time),int(cursor_id))
+  except (ValueError, OverflowError):
+    abort(400)
+  venue_id=request.args.get('venue_id', type=int)
+  artist_id=request.args.get('artist_id', type=int)
+
+  showdata=db.session.query(ShowCard).filter(ShowCard.starttime>=start)
+  if end:
+    showdata=showdata.filter(ShowCard.starttime<end)
+  if venue_id:
+    showdata=showdata.filter(ShowCard.venue_id==venue_id)
+  if artist_id:
+    showdata=showdata.filter(ShowCard.artist_id==artist_id)
+  if cursor:
+    showdata=showdata.filter(db.tuple_(ShowCard.starttime,ShowCard.show_id)>cursor)
+  per_page=app.config['SHOWS_PER_PAGE']
+  showdata=showdata.order_by(ShowCard.starttime,ShowCard.show_id).limit(per_page+1).all()
+
   data=[]
-  for i in showdata:
+  for i in showdata[:per_page]:
     data.append({
     "venue_id":i.venue_id,
     "venue_name":i.venue_name,
     "artist_id": i.artist_id,
     "artist_name": i.artist_name,
     "artist_image_link": i.artist_image_link,
-    "start_time": i.starttime.strftime("%Y-%m-%d %H:%M:%S")
+    "start_time": i.starttime
     })
-  
-  return render_template('pages/shows.html', shows=data)
+
+  filters={key:value for key,value in request.args.items() if key in ('start','end','venue_id','artist_id') and value}
+  next_url=None
+  if len(showdata)>per_page:
+    last=showdata[per_page-1]
+    next_url=url_for('shows', cursor=last.starttime.isoformat()+'_'+str(last.show_id), **filters)
+
+  return render_template('pages/shows.html', shows=data, filters=filters, next_url=next_url)
 
 @app.route('/shows/create')
 def create_shows():
@@ -463,17 +759,11 @@ def create_show_submission():
     starttime = request.form.get('start_time')
     artist_id = request.form.get('artist_id')
     venue_id = request.form.get('venue_id')
-    venue=db.session.query(Venue).filter_by(id=venue_id).first()
-    artist=db.session.query(Artist).filter_by(id=artist_id).first()
-    
+
     show = Show(
       starttime=starttime,
       artist_id=artist_id,
-      venue_id=venue_id,
-      venue_name=venue.name,
-      artist_name=artist.name,
-      artist_image_link=artist.image_link,
-      venue_image_link=venue.image_link
+      venue_id=venue_id
     )
     db.session.add(show)
     db.session.commit()
@@ -484,10 +774,16 @@ def create_show_submission():
     #(DONE) TODO: on unsuccessful db insert, flash an error instead.
     flash('An error occurred. Show could not be listed.')
     db.session.rollback()
-  finally:
-    db.session.close()
   return render_template('pages/home.html')
 
+@app.route('/stats/page-cache')
+def page_cache_stats():
+  return jsonify(page_cache.stats())
+
+@app.route('/stats/database')
+def database_stats():
+  return jsonify(pool_metrics.snapshot())
+
 @app.errorhandler(404)
 def not_found_error(error):
     return render_template('errors/404.html'), 404
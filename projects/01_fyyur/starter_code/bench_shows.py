@@ -0,0 +1,77 @@
+"""Times rendering the /shows page with many rows.
+
+Usage: python bench_shows.py [shows]
+
+The shows are written to DATABASE_URL, a temporary SQLite file by default,
+which is dropped and recreated, and all listed on a single page.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SHOWS = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+os.environ['SHOWS_PER_PAGE'] = str(SHOWS)
+
+import babel.dates
+import dateutil.parser
+from app import app, db, format_datetime, Venue, Artist, Show
+
+ROUNDS = 5
+
+
+def legacy_format_datetime(value, format='medium'):
+  """The filter as it was, handlers passed it strftime() strings."""
+  date = dateutil.parser.parse(value)
+  if format == 'full':
+      format="EEEE MMMM, d, y 'at' h:mma"
+  elif format == 'medium':
+      format="EE MM, dd, y h:mma"
+  return babel.dates.format_datetime(date, format)
+
+
+def legacy_filter(value, format='medium'):
+  return legacy_format_datetime(value.strftime("%Y-%m-%d %H:%M:%S"), format)
+
+
+def populate():
+  db.drop_all()
+  db.create_all()
+  db.session.add_all([Venue(name='Venue %d' % i) for i in range(100)] + [Artist(name='Artist %d' % i) for i in range(100)])
+  db.session.commit()
+  # shows start on the hour, evenings of the coming year
+  start = datetime.now().replace(hour=19, minute=0, second=0, microsecond=0) + timedelta(days=1)
+  for i in range(SHOWS):
+    db.session.add(Show(venue_id=random.randint(1, 100), artist_id=random.randint(1, 100),
+                        starttime=start + timedelta(days=random.randint(0, 365), hours=random.randint(0, 4))))
+  db.session.commit()
+
+
+def timed(client):
+  best = None
+  for _ in range(ROUNDS):
+    start = time.perf_counter()
+    response = client.get('/shows')
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+
+if __name__ == '__main__':
+  with app.app_context():
+    populate()
+    client = app.test_client()
+    print('%d shows on %s' % (SHOWS, db.engine.url))
+
+    app.jinja_env.filters['datetime'] = legacy_filter
+    print('GET /shows, strftime + parse + format_datetime: %8.1f ms' % (timed(client) * 1000))
+
+    app.jinja_env.filters['datetime'] = format_datetime
+    print('GET /shows, cached patterns and results:        %8.1f ms' % (timed(client) * 1000))
+    print(format_datetime.cache_info())
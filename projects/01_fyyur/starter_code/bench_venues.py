@@ -0,0 +1,71 @@
+"""Times the /venues page against a synthetic catalogue.
+
+Usage: python bench_venues.py [venues] [shows per venue]
+
+The catalogue is written to DATABASE_URL, a temporary SQLite file by
+default, which is dropped and recreated.
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if 'DATABASE_URL' not in os.environ:
+  os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+
+from app import app, db, Venue, Show
+
+VENUES = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+SHOWS_PER_VENUE = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+AREAS = 500
+ROUNDS = 5
+
+
+def populate():
+  db.drop_all()
+  db.create_all()
+  now = datetime.now()
+  db.session.execute(Venue.__table__.insert(), [
+    {'id': i, 'name': 'Venue %d' % i, 'city': 'City %d' % (i % AREAS), 'state': 'S%d' % (i % 50)}
+    for i in range(1, VENUES + 1)])
+  db.session.execute(Show.__table__.insert(), [
+    {'venue_id': random.randint(1, VENUES), 'starttime': now + timedelta(days=random.randint(-365, 365))}
+    for i in range(VENUES * SHOWS_PER_VENUE)])
+  db.session.commit()
+
+
+def legacy_venues():
+  """The nested scan /venues used to do, without counting any shows."""
+  data=[]
+  for i in db.session.query(Venue):
+    flag=False
+    for j in data:
+      if j['city']==i.city and j['state']==i.state:
+        index = data.index(j)
+        data[index]['venues'].append({"id":i.id,"name":i.name,"num_upcoming_shows":0})
+        flag=True
+        break
+    if flag==False:
+      data.append({"city":i.city,"state":i.state,"venues":[{"id":i.id,"name":i.name,"num_upcoming_shows":0}]})
+  return data
+
+
+def timed(function):
+  best = None
+  for _ in range(ROUNDS):
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    best = elapsed if best is None else min(best, elapsed)
+  return best
+
+
+if __name__ == '__main__':
+  with app.app_context():
+    populate()
+    print('%d venues, %d shows on %s' % (VENUES, VENUES * SHOWS_PER_VENUE, db.engine.url))
+    client = app.test_client()
+    print('legacy grouping (no counts): %8.1f ms' % (timed(legacy_venues) * 1000))
+    print('GET /venues (with counts):   %8.1f ms' % (timed(lambda: client.get('/venues')) * 1000))
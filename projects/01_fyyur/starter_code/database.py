@@ -0,0 +1,196 @@
+#----------------------------------------------------------------------------#
+# Database engine settings and connection pool metrics.
+#
+# config.py passes engine_options() to Flask-SQLAlchemy as
+# SQLALCHEMY_ENGINE_OPTIONS and the replicas as SQLALCHEMY_BINDS. Every
+# setting can be overridden from the environment.
+#----------------------------------------------------------------------------#
+
+import itertools
+import os
+import threading
+import time
+import weakref
+
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.engine.url import make_url
+from sqlalchemy.pool import QueuePool
+
+# connections kept open, and opened on top of them under load
+POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE', 5))
+MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW', 10))
+
+# seconds a request waits for a connection before failing
+POOL_TIMEOUT = int(os.environ.get('DATABASE_POOL_TIMEOUT', 30))
+
+# seconds after which a connection is replaced, below the server's and any
+# proxy's idle timeouts
+POOL_RECYCLE = int(os.environ.get('DATABASE_POOL_RECYCLE', 1800))
+
+# milliseconds a statement may run on PostgreSQL before being cancelled
+STATEMENT_TIMEOUT = int(os.environ.get('DATABASE_STATEMENT_TIMEOUT', 5000))
+
+# read replicas, as a comma separated list of database URLs
+REPLICA_URIS = [uri.strip() for uri in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if uri.strip()]
+
+
+class PoolMetrics:
+  # how long requests wait for a pool connection, and how many connections
+  # are in use. Each worker process has its own pool per database, so the
+  # connections used on a server are at most workers * (POOL_SIZE + MAX_OVERFLOW).
+  # The primary's and the replicas' pools are added up
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self.pools = weakref.WeakSet()
+    self.reset()
+
+  def reset(self):
+    with self._lock:
+      self.checkouts = 0
+      self.wait_total = 0.0
+      self.wait_max = 0.0
+      self.in_use_max = 0
+
+  def record_checkout(self, pool, wait):
+    with self._lock:
+      self.pools.add(pool)
+      self.checkouts += 1
+      self.wait_total += wait
+      self.wait_max = max(self.wait_max, wait)
+      self.in_use_max = max(self.in_use_max, sum(pool.checkedout() for pool in self.pools))
+
+  def snapshot(self):
+    with self._lock:
+      pools = list(self.pools)
+      return {
+        "pools": len(pools),
+        "pool_size": sum(pool.size() for pool in pools) if pools else POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "in_use": sum(pool.checkedout() for pool in pools),
+        "idle": sum(pool.checkedin() for pool in pools),
+        "in_use_max": self.in_use_max,
+        "checkouts": self.checkouts,
+        "checkout_wait_ms_avg": 1000 * self.wait_total / self.checkouts if self.checkouts else 0.0,
+        "checkout_wait_ms_max": 1000 * self.wait_max,
+      }
+
+
+pool_metrics = PoolMetrics()
+
+
+class InstrumentedQueuePool(QueuePool):
+  # QueuePool timing how long each checkout waits for a connection
+
+  def _do_get(self):
+    start = time.perf_counter()
+    connection = super(InstrumentedQueuePool, self)._do_get()
+    pool_metrics.record_checkout(self, time.perf_counter() - start)
+    return connection
+
+
+def engine_options(uri):
+  # SQLAlchemy engine options for the database at `uri`, the pool settings
+  # only apply to client/server databases, not SQLite
+  if make_url(uri).get_backend_name() == 'sqlite':
+    return {}
+
+  options = {
+    'poolclass': InstrumentedQueuePool,
+    'pool_size': POOL_SIZE,
+    'max_overflow': MAX_OVERFLOW,
+    'pool_timeout': POOL_TIMEOUT,
+    'pool_recycle': POOL_RECYCLE,
+    # checks connections before use, dropped ones are replaced transparently
+    'pool_pre_ping': True,
+  }
+  if make_url(uri).get_backend_name() == 'postgresql':
+    options['connect_args'] = {'options': '-c statement_timeout=%d' % STATEMENT_TIMEOUT}
+  return options
+
+
+def replica_binds(uris):
+  # the SQLALCHEMY_BINDS of the replicas. No model has one of these bind
+  # keys, they are only used by RoutingSession
+  return dict(('replica_%d' % i, uri) for (i, uri) in enumerate(uris))
+
+
+class RoutingSession(SignallingSession):
+  # session reading from the replica engine set in info['replica'] and from
+  # the primary otherwise. Once it writes, it stays on the primary for the
+  # rest of the request so that it reads what it wrote, and once those
+  # writes are committed info['committed_writes'] is set
+
+  def get_bind(self, mapper=None, clause=None):
+    replica = self.info.get('replica')
+    if replica is not None and not self._flushing:
+      return replica
+    return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+# flushes only run with pending changes, so these track actual writes
+
+@event.listens_for(RoutingSession, 'before_flush')
+def read_from_primary(session, flush_context, instances):
+  session.info.pop('replica', None)
+
+@event.listens_for(RoutingSession, 'after_flush')
+def record_writes(session, flush_context):
+  session.info['uncommitted_writes'] = True
+
+@event.listens_for(RoutingSession, 'after_commit')
+def record_committed_writes(session):
+  if session.info.pop('uncommitted_writes', False):
+    session.info['committed_writes'] = True
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def discard_writes(session):
+  session.info.pop('uncommitted_writes', None)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+  # Flask-SQLAlchemy with RoutingSession sessions and a round robin over the
+  # replicas of SQLALCHEMY_BINDS
+
+  def __init__(self, *args, **kwargs):
+    self._replica_keys = None
+    self._replica_lock = threading.Lock()
+    super(RoutingSQLAlchemy, self).__init__(*args, **kwargs)
+
+  def create_session(self, options):
+    return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+  def next_replica(self):
+    # the engine of the next replica, None without replicas
+    app = self.get_app()
+    with self._replica_lock:
+      if self._replica_keys is None:
+        keys = sorted(key for key in app.config['SQLALCHEMY_BINDS'] or {} if key.startswith('replica_'))
+        self._replica_keys = itertools.cycle(keys) if keys else iter(())
+      key = next(self._replica_keys, None)
+    return self.get_engine(app, bind=key) if key else None
+
+  def route_reads(self, replica):
+    # sends the queries of the current request to a replica when `replica`,
+    # to the primary otherwise. Forgets what a previous request using the
+    # same session did
+    info = self.session.info
+    info.pop('committed_writes', None)
+    info.pop('replica', None)
+    engine = self.next_replica() if replica else None
+    if engine is not None:
+      info['replica'] = engine
+
+  def replica(self):
+    # the replica engine of the current request, None when it reads from the
+    # primary
+    return self.session.info.get('replica')
+
+  def read_from_primary(self):
+    # sends the rest of the current request's queries to the primary
+    self.session.info.pop('replica', None)
+
+  def committed_writes(self):
+    # whether the current request committed any write
+    return self.session.info.get('committed_writes', False)
@@ -0,0 +1,46 @@
+"""trigram indexes for the venue and artist searches
+
+Revision ID: 3c9a1d7e52b4
+Revises: 5f3d249a2cf0
+Create Date: 2026-10-18 16:21:05.410377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1d7e52b4'
+down_revision = '5f3d249a2cf0'
+branch_labels = None
+depends_on = None
+
+
+# the indexed expressions must stay identical to search.search_fields() for
+# the planner to use them, they are PostgreSQL only and so aren't declared on
+# the models
+INDEXES = [
+    ('ix_{table}_name_trgm', 'name'),
+    ('ix_{table}_location_trgm', "(city || ', ' || state)"),
+    ('ix_{table}_genres_trgm', 'genres'),
+]
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for table in ('Venue', 'Artist'):
+        for (name, expression) in INDEXES:
+            op.execute('CREATE INDEX "{}" ON "{}" USING gin ({} gin_trgm_ops)'.format(
+                name.format(table=table), table, expression))
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for table in ('Venue', 'Artist'):
+        for (name, expression) in INDEXES:
+            op.execute('DROP INDEX "{}"'.format(name.format(table=table)))
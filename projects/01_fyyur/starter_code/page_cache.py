@@ -0,0 +1,117 @@
+#----------------------------------------------------------------------------#
+# Cache of rendered venue and artist pages.
+#
+# Pages are stored under a key such as 'venue-4' together with the version
+# stamp they were rendered at, and are only served for that same version, so
+# bumping an entity's stamp invalidates its page in every process. Entries
+# also carry an expiry, the time the page would render differently without
+# any write (an upcoming show becoming a past one).
+#----------------------------------------------------------------------------#
+
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+
+class PageCache:
+  # bounded in-process LRU, backed by one file per key in `directory` when
+  # given so that rendered pages survive restarts
+
+  def __init__(self, maxsize=500, directory=None):
+    self.maxsize = maxsize
+    self.directory = directory
+    self.hits = 0
+    self.disk_hits = 0
+    self.misses = 0
+    self._pages = OrderedDict()
+    self._lock = threading.Lock()
+    if directory:
+      os.makedirs(directory, exist_ok=True)
+
+  def get(self, key, version):
+    # the page of `key` rendered at `version`, or None
+    now = datetime.now()
+    with self._lock:
+      entry = self._pages.get(key)
+      if entry is not None and entry[0] == version and (entry[1] is None or entry[1] > now):
+        self._pages.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    entry = self._read(key)
+    if entry is not None and entry[0] == version and (entry[1] is None or entry[1] > now):
+      self._remember(key, entry)
+      with self._lock:
+        self.disk_hits += 1
+      return entry[2]
+
+    with self._lock:
+      self.misses += 1
+    return None
+
+  def put(self, key, version, body, expires_at=None):
+    entry = (version, expires_at, body)
+    self._remember(key, entry)
+    if self.directory:
+      self._write(key, entry)
+
+  def invalidate(self, key):
+    with self._lock:
+      self._pages.pop(key, None)
+    if self.directory:
+      try:
+        os.remove(self._path(key))
+      except FileNotFoundError:
+        pass
+
+  def stats(self):
+    with self._lock:
+      return {
+        "hits": self.hits,
+        "disk_hits": self.disk_hits,
+        "misses": self.misses,
+        "size": len(self._pages),
+        "maxsize": self.maxsize,
+      }
+
+  def _remember(self, key, entry):
+    with self._lock:
+      self._pages[key] = entry
+      self._pages.move_to_end(key)
+      while len(self._pages) > self.maxsize:
+        self._pages.popitem(last=False)
+
+  def _path(self, key):
+    return os.path.join(self.directory, key + '.html')
+
+  # a disk entry is a header line with the version and the expiry, then the page
+
+  def _read(self, key):
+    if not self.directory:
+      return None
+    # a truncated or corrupt file is a miss, and is overwritten by the next put()
+    try:
+      with open(self._path(key), encoding='utf-8') as page:
+        version, expires_at = page.readline().split()
+        body = page.read()
+      version = int(version)
+      expires_at = None if expires_at == '-' else datetime.fromisoformat(expires_at)
+    except (OSError, ValueError):
+      return None
+    return (version, expires_at, body)
+
+  def _write(self, key, entry):
+    version, expires_at, body = entry
+    header = '%d %s\n' % (version, expires_at.isoformat() if expires_at else '-')
+    descriptor, temporary = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+    try:
+      with os.fdopen(descriptor, 'w', encoding='utf-8') as page:
+        page.write(header + body)
+      os.replace(temporary, self._path(key))
+    except OSError:
+      try:
+        os.remove(temporary)
+      except OSError:
+        pass
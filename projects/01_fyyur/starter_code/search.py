@@ -0,0 +1,161 @@
+#----------------------------------------------------------------------------#
+# Typo tolerant search over venue and artist names, locations and genres.
+#
+# On PostgreSQL this relies on the pg_trgm GIN indexes of the migrations
+# 3c9a1d7e52b4 and 9e61b0f4a8d3 and on word_similarity(), elsewhere
+# (SQLite) on an in-process trigram index rebuilt after writes.
+#----------------------------------------------------------------------------#
+
+import re
+import threading
+import time
+from collections import defaultdict
+
+from sqlalchemy import event, text
+
+# pg_trgm's default pg_trgm.word_similarity_threshold
+SIMILARITY_THRESHOLD = 0.6
+
+WORD = re.compile(r'[^\W_]+', re.UNICODE)
+
+
+def trigrams(value):
+  # the trigrams pg_trgm extracts, every word padded with two spaces in
+  # front and one behind
+  grams = set()
+  for word in WORD.findall((value or '').lower()):
+    word = '  ' + word + ' '
+    for i in range(len(word) - 2):
+      grams.add(word[i:i + 3])
+  return grams
+
+
+def search_fields(model):
+  # the searched columns, as SQL expressions matching the indexed ones,
+  # genres are searched through Genre.name. The location is parenthesized
+  # as PostgreSQL gives || and <% the same precedence
+  return [
+    model.name,
+    (model.city + ', ' + model.state).self_group(),
+  ]
+
+
+class TrigramIndex:
+  # in-process stand-in for the pg_trgm indexes, scoring a document by the
+  # share of the term's trigrams found in its best matching field, which
+  # approximates word_similarity()
+
+  def __init__(self, rows):
+    self.names = {}
+    self.postings = defaultdict(lambda: defaultdict(set))
+    for (id, name, location, genres) in rows:
+      self.names[id] = name or ''
+      for (field, value) in enumerate((name, location, genres)):
+        for gram in trigrams(value):
+          self.postings[gram][field].add(id)
+
+  def search(self, term, threshold=SIMILARITY_THRESHOLD):
+    # ids of the documents similar to `term`, best match first
+    grams = trigrams(term)
+    if len(grams) == 0:
+      return []
+
+    hits = defaultdict(int)
+    for gram in grams:
+      for (field, ids) in self.postings.get(gram, {}).items():
+        for id in ids:
+          hits[(id, field)] += 1
+
+    scores = {}
+    for ((id, field), count) in hits.items():
+      scores[id] = max(scores.get(id, 0), count / len(grams))
+
+    matches = [id for (id, score) in scores.items() if score >= threshold]
+    return sorted(matches, key=lambda id: (-scores[id], self.names[id], id))
+
+
+class FuzzySearch:
+  # similarity search over one model and its genres, `genre_column` is the
+  # model's column of its genre association table. `search()` returns the
+  # number of matches and the ids of one page of them, best match first
+
+  def __init__(self, db, model, genre_column, genre_model, ttl=300):
+    self.db = db
+    self.model = model
+    self.genre_column = genre_column
+    self.genre_model = genre_model
+    self.ttl = ttl
+    self._trigram = None
+    self._index = None
+    self._expires_at = 0.0
+    self._lock = threading.Lock()
+
+    for name in ('after_insert', 'after_update', 'after_delete'):
+      event.listen(model, name, self.invalidate)
+
+  def search(self, term, offset, limit, genre=None):
+    # `genre` restricts the matches to the ones of that genre
+    if self.trigram():
+      return self._search_trigram(term, offset, limit, genre)
+
+    ranked = self._load().search(term)
+    if genre:
+      members = set(id for (id,) in self._genre_query().filter(self.genre_model.name == genre))
+      ranked = [id for id in ranked if id in members]
+    return (len(ranked), ranked[offset:offset + limit])
+
+  def trigram(self):
+    if self._trigram is None:
+      engine = self.db.engine
+      self._trigram = False
+      if engine.dialect.name == 'postgresql':
+        with engine.connect() as connection:
+          self._trigram = connection.execute(
+            text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).scalar() is not None
+    return self._trigram
+
+  def invalidate(self, *args):
+    with self._lock:
+      self._index = None
+
+  def _genre_query(self, *columns):
+    genre = self.genre_model
+    return self.db.session.query(self.genre_column, *columns)\
+      .join(genre, genre.id == self.genre_column.table.c.genre_id)
+
+  def _search_trigram(self, term, offset, limit, genre):
+    # `term <% field` is the indexable form of word_similarity() >= threshold
+    db = self.db
+    model = self.model
+    genre_name = self.genre_model.name
+    fields = search_fields(model)
+
+    own_genres = self._genre_query().filter(self.genre_column == model.id).correlate(model)
+    genre_match = own_genres.filter(db.literal(term).op('<%')(genre_name)).exists()
+    genre_score = own_genres.with_entities(db.func.max(db.func.word_similarity(term, genre_name)))\
+      .label('genre_similarity')
+    score = db.func.greatest(genre_score, *[db.func.word_similarity(term, field) for field in fields])
+
+    matches = db.session.query(model.id)\
+      .filter(db.or_(genre_match, *[db.literal(term).op('<%')(field) for field in fields]))
+    if genre:
+      matches = matches.filter(model.id.in_(self._genre_query().filter(genre_name == genre)))
+    count = matches.count()
+    ids = [id for (id,) in matches.order_by(score.desc(), model.name, model.id).limit(limit).offset(offset)]
+    return (count, ids)
+
+  def _load(self):
+    index = self._index
+    if index is not None and self._expires_at > time.monotonic():
+      return index
+
+    model = self.model
+    genres = defaultdict(list)
+    for (id, name) in self._genre_query(self.genre_model.name):
+      genres[id].append(name)
+    rows = self.db.session.query(model.id, *search_fields(model))
+    index = TrigramIndex((id, name, location, ' '.join(genres[id])) for (id, name, location) in rows)
+    with self._lock:
+      self._index = index
+      self._expires_at = time.monotonic() + self.ttl
+    return index
@@ -0,0 +1,422 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+# the tests run against their own database, a temporary SQLite file unless
+# TEST_DATABASE_URL is set, and another file stands in for a read replica
+TEST_DIRECTORY = tempfile.mkdtemp()
+TEST_DATABASE_URL = os.environ.get('TEST_DATABASE_URL') or \
+  'sqlite:///' + os.path.join(TEST_DIRECTORY, 'fyyur_test.db')
+TEST_REPLICA_URL = 'sqlite:///' + os.path.join(TEST_DIRECTORY, 'fyyur_test_replica.db')
+os.environ['DATABASE_URL'] = TEST_DATABASE_URL
+os.environ.pop('DATABASE_REPLICA_URLS', None)
+
+from flask_migrate import downgrade, upgrade
+from werkzeug.exceptions import NotFound
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+import app as fyyur
+import database
+from app import app, db, Venue, Artist, Genre, Show, ShowCard
+from page_cache import PageCache
+from search import TrigramIndex, search_fields
+
+# in case another test module imported the app first
+app.config['SQLALCHEMY_DATABASE_URI'] = TEST_DATABASE_URL
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database.engine_options(TEST_DATABASE_URL)
+app.config['SQLALCHEMY_BINDS'] = {}
+app.config['TESTING'] = True
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+
+def migration(revision):
+  # the module of a migration, to test its helpers
+  for name in os.listdir(os.path.join(MIGRATIONS, 'versions')):
+    if name.startswith(revision) and name.endswith('.py'):
+      spec = importlib.util.spec_from_file_location(name[:-3], os.path.join(MIGRATIONS, 'versions', name))
+      module = importlib.util.module_from_spec(spec)
+      spec.loader.exec_module(module)
+      return module
+
+
+class FyyurTestCase(unittest.TestCase):
+  # a fresh schema, page cache and search indexes for every test
+
+  def setUp(self):
+    self.app_context = app.app_context()
+    self.app_context.push()
+    db.create_all()
+    fyyur.page_cache = PageCache()
+    for search in fyyur.fuzzy_search.values():
+      search.invalidate()
+    self.client = app.test_client()
+
+  def tearDown(self):
+    db.session.remove()
+    db.drop_all()
+    self.app_context.pop()
+
+  def add(self, *rows):
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+#----------------------------------------------------------------------------#
+# Fuzzy search.
+#----------------------------------------------------------------------------#
+
+class TrigramIndexTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.index = TrigramIndex([
+      (1, 'The Musical Hop', 'San Francisco, CA', 'Jazz Swing'),
+      (2, 'Park Square Live Music & Coffee', 'San Francisco, CA', 'Rock n Roll'),
+      (3, 'The Dueling Pianos Bar', 'New York, NY', 'Classical'),
+    ])
+
+  def test_ranks_best_match_first(self):
+    self.assertEqual(self.index.search('musical'), [1, 2])
+    self.assertEqual(self.index.search('pianoz'), [3])
+
+  def test_threshold(self):
+    self.assertEqual(self.index.search('musical', threshold=0.7), [1])
+    # 'Classical' shares half of the trigrams of 'musical'
+    self.assertEqual(self.index.search('musical', threshold=0.5), [1, 2, 3])
+    self.assertEqual(self.index.search('quartet'), [])
+    self.assertEqual(self.index.search(''), [])
+
+  def test_matches_locations_and_genres(self):
+    self.assertEqual(self.index.search('new yrk'), [3])
+    self.assertEqual(self.index.search('jaz'), [1])
+
+
+class FuzzySearchTestCase(FyyurTestCase):
+
+  def test_location_is_grouped_on_postgresql(self):
+    # PostgreSQL gives || and <% the same precedence, the location has to
+    # be parenthesized for the whole of it to be compared
+    location = search_fields(Venue)[1]
+    compiled = str(db.literal('term').op('<%')(location).compile(dialect=postgresql.dialect()))
+    self.assertTrue(compiled.endswith(')'))
+    self.assertIn('<% ("Venue".city ||', compiled)
+
+  def test_falls_back_without_pg_trgm(self):
+    self.add(
+      Venue(name='The Musical Hop', city='San Francisco', state='CA', genres=fyyur.genres_named(['Jazz'])),
+      Venue(name='The Dueling Pianos Bar', city='New York', state='NY'),
+    )
+    search = fyyur.fuzzy_search[Venue]
+    self.assertFalse(search.trigram())
+
+    count, ids = search.search('musicl hop', 0, 10)
+    self.assertEqual(count, 1)
+    self.assertEqual(db.session.query(Venue.name).filter(Venue.id == ids[0]).scalar(), 'The Musical Hop')
+    self.assertEqual(search.search('pianos', 0, 10, genre='Jazz'), (0, []))
+
+    # writes invalidate the in-process index
+    self.add(Venue(name='Musical Pianos', city='Austin', state='TX'))
+    self.assertEqual(search.search('musical', 0, 10)[0], 2)
+
+    results = fyyur.search_by_name(Venue, fyyur.Show.venue_id, 'musicl', 1, mode='fuzzy')
+    # equal scores are ordered by name
+    self.assertEqual([venue['name'] for venue in results['data']], ['Musical Pianos', 'The Musical Hop'])
+
+
+
+#----------------------------------------------------------------------------#
+# Genres.
+#----------------------------------------------------------------------------#
+
+class GenreMigrationTestCase(FyyurTestCase):
+  # the genre strings of migration 9e61b0f4a8d3
+
+  def setUp(self):
+    super(GenreMigrationTestCase, self).setUp()
+    self.genre_tables = migration('9e61b0f4a8d3')
+
+  def test_parse_genres(self):
+    parse = self.genre_tables.parse_genres
+    self.assertEqual(parse('{Jazz,"Rock n Roll",Swing}'), ['Jazz', 'Rock n Roll', 'Swing'])
+    self.assertEqual(parse('{"Say \\"hi\\"",Folk}'), ['Say "hi"', 'Folk'])
+    self.assertEqual(parse("['Jazz', 'Rock n Roll']"), ['Jazz', 'Rock n Roll'])
+    self.assertEqual(parse('Jazz, Folk'), ['Jazz', 'Folk'])
+    self.assertEqual(parse('{}'), [])
+    self.assertEqual(parse(None), [])
+
+  def test_format_genres_round_trips(self):
+    genres = self.genre_tables
+    for names in (['Jazz'], ['Jazz', 'Rock n Roll'], ['R&B', 'Say "hi"', 'a,b', 'back\\slash'], []):
+      self.assertEqual(genres.parse_genres(genres.format_genres(names)), names)
+    self.assertEqual(genres.format_genres(['Jazz', 'Rock n Roll']), '{Jazz,"Rock n Roll"}')
+
+  def test_upgrade_and_downgrade(self):
+    db.session.remove()
+    db.drop_all()
+    upgrade(directory=MIGRATIONS, revision='3c9a1d7e52b4')
+    try:
+      with db.engine.begin() as connection:
+        connection.execute(text('INSERT INTO "Venue" (id, name, genres) VALUES '
+          '(1, \'Hop\', \'{Jazz,"Rock n Roll"}\'), (2, \'Bar\', \'{}\')'))
+        connection.execute(text('INSERT INTO "Artist" (id, name, genres) VALUES '
+          '(1, \'Band\', \'{Jazz}\')'))
+
+      upgrade(directory=MIGRATIONS, revision='9e61b0f4a8d3')
+      with db.engine.connect() as connection:
+        self.assertEqual([name for (name,) in connection.execute(text('SELECT name FROM "Genre" ORDER BY name'))],
+                         ['Jazz', 'Rock n Roll'])
+        self.assertEqual(connection.execute(text('SELECT count(*) FROM venue_genres')).scalar(), 2)
+        self.assertEqual(connection.execute(text('SELECT count(*) FROM artist_genres')).scalar(), 1)
+
+      downgrade(directory=MIGRATIONS, revision='3c9a1d7e52b4')
+      with db.engine.connect() as connection:
+        venues = dict((id, genres) for (id, genres) in connection.execute(text('SELECT id, genres FROM "Venue"')))
+        self.assertEqual(venues, {1: '{Jazz,"Rock n Roll"}', 2: None})
+        self.assertEqual(connection.execute(text('SELECT genres FROM "Artist"')).scalar(), '{Jazz}')
+    finally:
+      downgrade(directory=MIGRATIONS, revision='base')
+      with db.engine.begin() as connection:
+        connection.execute(text('DROP TABLE alembic_version'))
+
+
+class GenreHelpersTestCase(FyyurTestCase):
+
+  def test_genres_named_reuses_existing_genres(self):
+    jazz, = self.add(Genre(name='Jazz'))
+    genres = fyyur.genres_named([' Jazz', 'Folk', '', 'Folk'])
+    self.assertEqual([genre.name for genre in genres], ['Jazz', 'Folk'])
+    self.assertIs(genres[0], jazz)
+    self.assertIsNone(genres[1].id)
+    self.assertEqual(fyyur.genres_named([' ']), [])
+
+  def test_with_genre(self):
+    self.add(Venue(name='Hop', genres=fyyur.genres_named(['Jazz', 'Swing'])))
+    self.add(Venue(name='Bar', genres=fyyur.genres_named(['Swing'])), Venue(name='Hall'))
+    query = db.session.query(Venue.name).order_by(Venue.name)
+    self.assertEqual([name for (name,) in fyyur.with_genre(query, Venue, 'Swing')], ['Bar', 'Hop'])
+    self.assertEqual([name for (name,) in fyyur.with_genre(query, Venue, 'Jazz')], ['Hop'])
+    self.assertEqual([name for (name,) in fyyur.with_genre(query, Venue, 'Rock')], [])
+    self.assertEqual(fyyur.with_genre(query, Venue, None).count(), 3)
+
+
+
+#----------------------------------------------------------------------------#
+# Show cards.
+#----------------------------------------------------------------------------#
+
+class ShowCardsTestCase(FyyurTestCase):
+  # show_cards is kept in sync with Show, Venue and Artist by listeners
+
+  def setUp(self):
+    super(ShowCardsTestCase, self).setUp()
+    self.hop, self.bar, self.band = self.add(
+      Venue(name='Hop', image_link='hop.png'),
+      Venue(name='Bar', image_link='bar.png'),
+      Artist(name='Band', image_link='band.png'),
+    )
+    self.starttime = datetime(2030, 1, 5, 19, 30)
+    self.show, = self.add(Show(venue_id=self.hop.id, artist_id=self.band.id, starttime=self.starttime))
+
+  def card(self):
+    db.session.expire_all()
+    return ShowCard.query.get(self.show.id)
+
+  def test_insert(self):
+    card = self.card()
+    self.assertEqual((card.starttime, card.venue_id, card.venue_name, card.venue_image_link),
+                     (self.starttime, self.hop.id, 'Hop', 'hop.png'))
+    self.assertEqual((card.artist_id, card.artist_name, card.artist_image_link),
+                     (self.band.id, 'Band', 'band.png'))
+
+  def test_update(self):
+    self.show.venue_id = self.bar.id
+    self.show.starttime = self.starttime + timedelta(days=1)
+    db.session.commit()
+    card = self.card()
+    self.assertEqual((card.starttime, card.venue_id, card.venue_name, card.venue_image_link),
+                     (self.starttime + timedelta(days=1), self.bar.id, 'Bar', 'bar.png'))
+    self.assertEqual(ShowCard.query.count(), 1)
+
+  def test_delete(self):
+    db.session.delete(self.show)
+    db.session.commit()
+    self.assertIsNone(self.card())
+
+  def test_rename_venue(self):
+    self.hop.name = 'The Musical Hop'
+    self.hop.image_link = 'musical-hop.png'
+    db.session.commit()
+    card = self.card()
+    self.assertEqual((card.venue_name, card.venue_image_link), ('The Musical Hop', 'musical-hop.png'))
+    self.assertEqual(card.artist_name, 'Band')
+
+  def test_rename_artist(self):
+    version = self.hop.cache_version
+    self.band.name = 'The Band'
+    db.session.commit()
+    card = self.card()
+    # the venue's page shows the artist's card
+    self.assertGreater(self.hop.cache_version, version)
+    self.assertEqual((card.artist_name, card.artist_image_link), ('The Band', 'band.png'))
+    self.assertIn('The Band', self.client.get('/shows?start=2030-01-01').get_data(as_text=True))
+
+
+#----------------------------------------------------------------------------#
+# Venue and artist pages.
+#----------------------------------------------------------------------------#
+
+class WithShowsTestCase(FyyurTestCase):
+
+  def setUp(self):
+    super(WithShowsTestCase, self).setUp()
+    now = datetime.now()
+    self.venue, self.artist, self.other = self.add(
+      Venue(name='Hop', genres=fyyur.genres_named(['Jazz', 'Swing', 'Folk'])),
+      Artist(name='Band'),
+      Artist(name='Other Band'),
+    )
+    self.add(*[Show(venue_id=self.venue.id, artist_id=self.artist.id, starttime=now + timedelta(days=days))
+               for days in (-3, -10, 2, 1, 30)])
+    self.add(Show(venue_id=self.venue.id, artist_id=self.other.id, starttime=now - timedelta(days=1)))
+
+  def with_shows(self, entity_id):
+    return fyyur.with_shows(Venue, entity_id, ShowCard.venue_id,
+      [ShowCard.artist_id, ShowCard.artist_name, ShowCard.artist_image_link])
+
+  def test_splits_past_and_upcoming_shows(self):
+    venue, shows, counts = self.with_shows(self.venue.id)
+    self.assertEqual(venue.id, self.venue.id)
+    self.assertEqual(counts, {False: 3, True: 3})
+    self.assertEqual([len(shows[False]), len(shows[True])], [3, 3])
+    for part in shows.values():
+      times = [show['start_time'] for show in part]
+      self.assertEqual(times, sorted(times))
+    self.assertTrue(all(show['start_time'] < datetime.now() for show in shows[False]))
+    self.assertEqual(shows[False][-1]['artist_name'], 'Other Band')
+    self.assertEqual([genre.name for genre in venue.genres], ['Folk', 'Jazz', 'Swing'])
+
+  def test_without_shows(self):
+    venue, = self.add(Venue(name='Empty', genres=fyyur.genres_named(['Jazz'])))
+    venue, shows, counts = self.with_shows(venue.id)
+    self.assertEqual(venue.name, 'Empty')
+    self.assertEqual(shows, {False: [], True: []})
+    self.assertEqual(counts, {False: 0, True: 0})
+
+  def test_missing_entity(self):
+    with self.assertRaises(NotFound):
+      self.with_shows(404)
+
+  def test_pages(self):
+    body = self.client.get('/venues/%d' % self.venue.id).get_data(as_text=True)
+    self.assertIn('Other Band', body)
+    body = self.client.get('/artists/%d' % self.artist.id).get_data(as_text=True)
+    self.assertIn('Hop', body)
+    self.assertEqual(self.client.get('/artists/404').status_code, 404)
+
+
+
+#----------------------------------------------------------------------------#
+# Read replicas.
+#----------------------------------------------------------------------------#
+
+class ReplicaRoutingTestCase(FyyurTestCase):
+  # the primary and the replica hold different names for the same rows, to
+  # tell which one a page was read from
+
+  def setUp(self):
+    app.config['SQLALCHEMY_BINDS'] = database.replica_binds([TEST_REPLICA_URL])
+    db._replica_keys = None
+    super(ReplicaRoutingTestCase, self).setUp()
+    self.replica = db.get_engine(app, bind='replica_0')
+    db.Model.metadata.create_all(self.replica)
+
+    venue, artist = self.add(Venue(name='Primary Hall', city='SF', state='CA'), Artist(name='Primary Band'))
+    self.venue_id, self.artist_id = venue.id, artist.id
+    self.add(Show(venue_id=venue.id, artist_id=artist.id, starttime=datetime.now() + timedelta(days=1)))
+    self.replicate()
+    # requests run in the test's app context and share its session, start
+    # them from an empty one as they would outside tests
+    db.session.remove()
+
+  def tearDown(self):
+    db.Model.metadata.drop_all(self.replica)
+    super(ReplicaRoutingTestCase, self).tearDown()
+    app.config['SQLALCHEMY_BINDS'] = {}
+    db._replica_keys = None
+
+  def replicate(self, **names):
+    # copies the venue and artist to the replica, under other names
+    version = db.engine.execute(text('SELECT cache_version FROM "Venue"')).scalar()
+    with self.replica.begin() as connection:
+      connection.execute(text('DELETE FROM "Venue"'))
+      connection.execute(text('DELETE FROM "Artist"'))
+      connection.execute(text('INSERT INTO "Venue" (id, name, city, state, cache_version) '
+        'VALUES (:id, :name, \'SF\', \'CA\', :version)'),
+        {'id': self.venue_id, 'name': names.get('venue', 'Replica Hall'), 'version': names.get('version', version)})
+      connection.execute(text('INSERT INTO "Artist" (id, name, cache_version) VALUES (:id, \'Replica Band\', 0)'),
+        {'id': self.artist_id})
+
+  def test_reads_from_replica(self):
+    self.assertIn('Replica Hall', self.client.get('/venues').get_data(as_text=True))
+    self.assertIn('Replica Band', self.client.get('/artists').get_data(as_text=True))
+    self.assertIn('Replica Hall', self.client.post('/venues/search', data={'search_term': 'hall'}).get_data(as_text=True))
+    self.assertIn('Replica Hall', self.client.get('/venues/%d' % self.venue_id).get_data(as_text=True))
+    # views that aren't marked read from the primary
+    with app.test_request_context('/shows/create'):
+      app.preprocess_request()
+      self.assertIsNone(db.replica())
+
+  def test_reads_from_primary_after_flush(self):
+    with app.test_request_context('/venues'):
+      app.preprocess_request()
+      self.assertIsNotNone(db.replica())
+      name = db.session.query(Venue.name).filter(Venue.id == self.venue_id)
+      self.assertEqual(name.scalar(), 'Replica Hall')
+      db.session.add(Artist(name='Flushed'))
+      db.session.flush()
+      self.assertIsNone(db.replica())
+      self.assertEqual(name.scalar(), 'Primary Hall')
+      db.session.rollback()
+
+  def test_sticky_after_committed_write_only(self):
+    response = self.client.post('/shows/create', data={'artist_id': self.artist_id, 'venue_id': self.venue_id,
+                                                       'start_time': 'not a time'})
+    self.assertIn('could not be listed', response.get_data(as_text=True))
+    self.assertNotIn(fyyur.PRIMARY_UNTIL_COOKIE, response.headers.get('Set-Cookie', ''))
+    self.assertIn('Replica Hall', self.client.get('/venues').get_data(as_text=True))
+
+    response = self.client.post('/artists/create', data={'name': 'New Band', 'city': 'SF', 'state': 'CA',
+                                                         'phone': '', 'genres': 'Jazz', 'facebook_link': ''})
+    self.assertIn('successfully listed', response.get_data(as_text=True))
+    self.assertIn(fyyur.PRIMARY_UNTIL_COOKIE, response.headers.get('Set-Cookie', ''))
+    self.assertIn('Primary Hall', self.client.get('/venues').get_data(as_text=True))
+
+    # other clients keep reading from the replica
+    self.assertIn('Replica Hall', app.test_client().get('/venues').get_data(as_text=True))
+
+  def test_page_stamp_read_from_primary(self):
+    Venue.query.get(self.venue_id).name = 'Renamed Hall'
+    db.session.commit()
+    db.session.remove()
+
+    # the replica lags behind, with the older name and stamp: the page is
+    # rendered from the primary
+    self.replicate(version=0)
+    path = '/venues/%d' % self.venue_id
+    self.assertIn('Renamed Hall', self.client.get(path).get_data(as_text=True))
+    self.assertIn('Renamed Hall', self.client.get(path).get_data(as_text=True))
+    self.assertEqual(fyyur.page_cache.stats()['hits'], 1)
+
+    # once it caught up, missing pages are rendered from it
+    fyyur.page_cache = PageCache()
+    self.replicate(venue='Replica Renamed Hall')
+    db.session.remove()
+    self.assertIn('Replica Renamed Hall', self.client.get(path).get_data(as_text=True))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,24 @@
+import unittest
+from datetime import datetime
+
+import babel.dates
+
+from app import format_datetime
+
+
+class DatetimeFilterTestCase(unittest.TestCase):
+
+  def test_named_formats(self):
+    value = datetime(2030, 1, 5, 19, 30)
+    self.assertEqual(format_datetime(value, 'full'), 'Saturday January, 5, 2030 at 7:30PM')
+    self.assertEqual(format_datetime(value, 'medium'), 'Sat 01, 05, 2030 7:30PM')
+    for format in ('short', 'long'):
+      self.assertEqual(format_datetime(value, format), babel.dates.format_datetime(value, format))
+    self.assertEqual(format_datetime(value, 'short'), format_datetime('2030-01-05T19:30:00', 'short'))
+
+  def test_pattern(self):
+    self.assertEqual(format_datetime('2030-01-05T19:30:00', 'y-MM-dd'), '2030-01-05')
+
+
+if __name__ == '__main__':
+  unittest.main()
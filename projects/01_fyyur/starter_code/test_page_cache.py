@@ -0,0 +1,38 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+
+from page_cache import PageCache
+
+
+class PageCacheTestCase(unittest.TestCase):
+
+  def setUp(self):
+    self.directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.directory)
+
+  def test_disk_entry_survives_restart(self):
+    PageCache(directory=self.directory).put('venue-1', 3, '<html>', datetime.now() + timedelta(days=1))
+    cache = PageCache(directory=self.directory)
+    self.assertEqual(cache.get('venue-1', 3), '<html>')
+    self.assertIsNone(cache.get('venue-1', 4))
+    self.assertEqual(cache.stats()['disk_hits'], 1)
+
+  def test_corrupt_disk_entry_is_a_miss(self):
+    for header in ('3 not-a-date\n', 'three -\n', '3\n', ''):
+      with open(os.path.join(self.directory, 'venue-1.html'), 'w', encoding='utf-8') as page:
+        page.write(header + '<html>')
+      cache = PageCache(directory=self.directory)
+      self.assertIsNone(cache.get('venue-1', 3))
+      self.assertEqual(cache.stats()['misses'], 1)
+
+      cache.put('venue-1', 3, '<html>')
+      self.assertEqual(PageCache(directory=self.directory).get('venue-1', 3), '<html>')
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,106 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+"""Benchmark of POST /questions/search over a synthetic question bank.
+
+Fills the database at BENCH_DATABASE_URL (a SQLite file in the temp
+directory by default) with a synthetic corpus, then compares the ranked
+search of flaskr.search with the former unpaginated ILIKE scan.
+
+On PostgreSQL, run `flask db upgrade` on the target database first so
+that the full-text search column and its GIN index exist.
+
+    python bench_search.py [corpus size] [searches]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from flaskr import create_app
+from flaskr.search import QuestionSearch
+from models import db, Question, Category
+
+CATEGORIES = ['Science', 'Art', 'Geography', 'History', 'Entertainment',
+              'Sports']
+VOCABULARY_SIZE = 20000
+CHUNK_SIZE = 10000
+
+database_url = os.getenv('BENCH_DATABASE_URL', 'sqlite:///'
+                         + os.path.join(tempfile.gettempdir(),
+                         'trivia_bench.db'))
+
+
+def synthetic_words(rng, count):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+            for _ in range(count)]
+
+
+def fill(size, rng, vocabulary):
+    if Category.query.count() == 0:
+        db.session.add_all([Category(type) for type in CATEGORIES])
+        db.session.commit()
+
+    existing = Question.query.count()
+    start = time.perf_counter()
+    for offset in range(existing, size, CHUNK_SIZE):
+        rows = [{
+            'question': ' '.join(rng.choices(vocabulary,
+                                 k=rng.randint(6, 14))) + '?',
+            'answer': ' '.join(rng.choices(vocabulary,
+                               k=rng.randint(1, 3))),
+            'category': rng.randint(1, len(CATEGORIES)),
+            'difficulty': rng.randint(1, 5),
+            } for _ in range(min(CHUNK_SIZE, size - offset))]
+        db.session.execute(Question.__table__.insert(), rows)
+        db.session.commit()
+    if size > existing:
+        print('inserted %d questions in %.1fs' % (size - existing,
+              time.perf_counter() - start))
+
+
+def timed(function, terms):
+    start = time.perf_counter()
+    for term in terms:
+        function(term)
+    return (time.perf_counter() - start) / len(terms)
+
+
+def run(size, searches):
+    rng = random.Random(42)
+    vocabulary = synthetic_words(rng, VOCABULARY_SIZE)
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+    with app.app_context():
+        fill(size, rng, vocabulary)
+        terms = [rng.choice(vocabulary) for _ in range(searches)]
+
+        question_search = QuestionSearch()
+        print('corpus: %d questions, backend: %s' % (Question.query.count(),
+              ('full-text' if question_search.full_text() else 'inverted index'
+              )))
+
+        if not question_search.full_text():
+            start = time.perf_counter()
+            question_search.search(terms[0])
+            print('index build:  %8.1f ms' % ((time.perf_counter()
+                  - start) * 1e3))
+
+        ranked = timed(lambda term: question_search.search(term), terms)
+        ranked_answers = timed(lambda term: question_search.search(term,
+                               search_answers=True), terms)
+        ilike = timed(lambda term: \
+                      Question.query.filter(Question.question.ilike('%'
+                      + term + '%')).all(), terms[:max(1, searches // 10)])
+
+    print('ranked search:           %8.2f ms/search' % (ranked * 1e3))
+    print('ranked search + answers: %8.2f ms/search' % (ranked_answers
+          * 1e3))
+    print('ILIKE scan (before):     %8.2f ms/search' % (ilike * 1e3))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 100)
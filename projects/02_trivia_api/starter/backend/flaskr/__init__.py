@@ -1,14 +1,32 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
+import io
 import os
-from flask import Flask, request, abort, jsonify
+import click
+from flask import Flask, Response, request, abort, jsonify, \
+    stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
-import random
-
-from models import setup_db, Question, Category
-
-QUESTIONS_PER_PAGE = 10
+from models import setup_db, database_path, Question
+from .pagination import CountCache, page_size, paginate
+from . import bulk
+from .categories import CategoryRegistry
+from .question_index import QuestionIndex
+from .quiz_sessions import QuizSessions, UnknownSession, \
+    create_session_store
+from .search import QuestionSearch
+from .streaming import Counter, iter_formatted, stream_response, \
+    streaming_requested
+
+COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 60))
+QUESTION_INDEX_TTL = int(os.getenv('QUESTION_INDEX_TTL', 300))
+SEARCH_INDEX_TTL = int(os.getenv('SEARCH_INDEX_TTL', 300))
+CATEGORY_CACHE_TTL = int(os.getenv('CATEGORY_CACHE_TTL', 300))
+
+# 'memory' or a redis:// URL
+QUIZ_SESSION_STORE = os.getenv('QUIZ_SESSION_STORE', 'memory')
+QUIZ_SESSION_TTL = int(os.getenv('QUIZ_SESSION_TTL', 3600))
+QUIZ_SESSION_MAX = int(os.getenv('QUIZ_SESSION_MAX', 10000))
 
 
 def create_app(test_config=None):
@@ -16,10 +34,31 @@ def create_app(test_config=None):
   # create and configure the app
 
     app = Flask(__name__)
-    setup_db(app)
+    if test_config is None:
+        setup_db(app)
+    else:
+        setup_db(app, test_config.get('SQLALCHEMY_DATABASE_URI',
+                 database_path))
 
     CORS(app, resources={'/': {'origins': '*'}})
 
+    categories = CategoryRegistry(ttl=CATEGORY_CACHE_TTL)
+    app.extensions['categories'] = categories
+
+    question_counts = CountCache(ttl=COUNT_CACHE_TTL)
+    question_index = QuestionIndex(ttl=QUESTION_INDEX_TTL)
+    question_search = QuestionSearch(ttl=SEARCH_INDEX_TTL)
+
+    session_store = create_session_store((test_config
+            or {}).get('QUIZ_SESSION_STORE', QUIZ_SESSION_STORE),
+            ttl=QUIZ_SESSION_TTL, maxsize=QUIZ_SESSION_MAX)
+    quiz_sessions = QuizSessions(session_store, question_index)
+
+    def questions_changed():
+        question_counts.invalidate()
+        question_index.invalidate()
+        question_search.invalidate()
+
     @app.after_request
     def after_request(response):
         response.headers.add('Access-Control-Allow-Headers',
@@ -30,8 +69,7 @@ def create_app(test_config=None):
 
     @app.route('/categories')
     def retrieve_categories():
-        categories = Category.query.order_by(Category.id).all()
-        categories_data = [category.type for category in categories]
+        categories_data = categories.types()
 
         if len(categories_data) == 0:
             abort(404)
@@ -40,28 +78,34 @@ def create_app(test_config=None):
 
     @app.route('/questions')
     def retrieve_questions():
-        categories = Category.query.order_by(Category.id).all()
-        categories_data = [category.type for category in categories]
-
-        page = request.args.get('page', 1, type=int)
-
-        questions = Question.query.order_by(Question.id).all()
+        categories_data = categories.types()
+
+        if streaming_requested():
+            questions = iter_formatted(Question.query.order_by(Question.id))
+            return stream_response({'success': True,
+                                   'categories': categories_data,
+                                   'current_category': 'Science'},
+                                   'questions', questions, lambda: \
+                                   {'total_questions': question_counts.get('all'
+                                   , Question.query.count)})
+
+        (questions, next_cursor) = paginate(Question.query,
+                Question.id, page_size())
         questions_data = [question.format() for question in questions]
 
-        start = 10 * (page - 1)
-        end = start + 10
-
-        if len(questions_data[start:end]) == 0:
+        if len(questions_data) == 0:
             abort(404)
 
-        totalquestions = len(questions)
+        totalquestions = question_counts.get('all',
+                Question.query.count)
 
         return jsonify({
             'success': True,
-            'questions': questions_data[start:end],
+            'questions': questions_data,
             'total_questions': totalquestions,
             'categories': categories_data,
             'current_category': 'Science',
+            'next_cursor': next_cursor,
             })
 
     @app.route('/question/<int:question_id>', methods=['DELETE'])
@@ -73,6 +117,7 @@ def create_app(test_config=None):
             abort(404)
 
         question.delete()
+        questions_changed()
 
         return jsonify({'success': True})
 
@@ -91,12 +136,75 @@ def create_app(test_config=None):
                                    difficulty=difficulty,
                                    category=int(category) + 1)
             newquestion.insert()
+            questions_changed()
 
             return jsonify({'success': True})
         except:
 
             abort(422)
 
+    def category_exists(category_id):
+        return categories.get(category_id) is not None
+
+    @app.route('/questions/bulk', methods=['POST'])
+    def import_questions():
+        if request.mimetype == 'text/csv':
+            read = bulk.read_csv
+        else:
+            read = bulk.read_ndjson
+
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8',
+                                 newline='')
+        try:
+            summary = bulk.import_questions(read(lines), category_exists)
+        except bulk.ImportAborted as error:
+            # the batches before the error are committed, say how many
+            return (jsonify(dict(success=False, error=400,
+                    message='bad request', **error.summary)), 400)
+        finally:
+            questions_changed()
+
+        return jsonify(dict(success=True, **summary))
+
+    @app.route('/questions/export')
+    def export_questions():
+        export_format = request.args.get('format', 'ndjson')
+        if export_format not in bulk.EXPORTERS:
+            abort(400)
+
+        chunks = bulk.EXPORTERS[export_format]()
+        return Response(stream_with_context(chunks),
+                        mimetype=bulk.MIMETYPES[export_format])
+
+    @app.cli.command('import-questions')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--format', 'import_format', default='ndjson',
+                  type=click.Choice(list(bulk.READERS)))
+    def import_questions_command(source, import_format):
+        read = bulk.READERS[import_format]
+        try:
+            summary = bulk.import_questions(read(source), category_exists)
+        except bulk.ImportAborted as error:
+            raise click.ClickException('%s, %d questions were imported '
+                    'before it.' % (error, error.summary['imported']))
+        finally:
+            questions_changed()
+
+        click.echo('Imported %d questions, rejected %d.'
+                   % (summary['imported'], summary['rejected']))
+        for error in summary['errors']:
+            click.echo('line %d: %s' % (error['line'], error['error']),
+                       err=True)
+
+    @app.cli.command('export-questions')
+    @click.argument('destination', type=click.File('w', encoding='utf-8'
+                    ), default='-')
+    @click.option('--format', 'export_format', default='ndjson',
+                  type=click.Choice(list(bulk.EXPORTERS)))
+    def export_questions_command(destination, export_format):
+        for chunk in bulk.EXPORTERS[export_format]():
+            destination.write(chunk)
+
     @app.route('/questions/search', methods=['POST'])
     def search_question():
 
@@ -104,55 +212,81 @@ def create_app(test_config=None):
             body = request.get_json()
 
             searchTerm = body.get('searchTerm', None)
+            searchAnswers = bool(body.get('searchAnswers', False))
 
-            questions = \
-                Question.query.filter(Question.question.ilike('%'
-                    + searchTerm + '%')).all()
-
-            questions_data = [question.format() for question in
-                              questions]
-
-            return jsonify({
-                'success': True,
-                'questions': questions_data,
-                'total_questions': len(questions_data),
-                'currentCategory': 'Science',
-                })
+            if not isinstance(searchTerm, str):
+                abort(422)
         except:
 
             abort(422)
 
-    @app.route('/category/<int:id>/questions')
-    def retrieve_questionsByCategory(id):
-        categories = Category.query.order_by(Category.id).all()
-        categories_data = [category.type for category in categories]
+        if streaming_requested():
+            matches = Counter(question.format() for question in
+                              question_search.iter_search(searchTerm,
+                              searchAnswers))
+            return stream_response({'success': True,
+                                   'currentCategory': 'Science'},
+                                   'questions', matches, lambda: \
+                                   {'total_questions': matches.count})
+
+        per_page = page_size()
         page = request.args.get('page', 1, type=int)
+        if page < 1:
+            abort(400)
+
+        (questions, totalquestions) = question_search.search(searchTerm,
+                searchAnswers, (page - 1) * per_page, per_page)
 
-        questions = Question.query.filter_by(category=id
-                + 1).order_by(Question.id).all()
         questions_data = [question.format() for question in questions]
 
-        try:
-            current_category = Category.query.filter_by(id=id
-                    + 1).first().type
-        except:
+        return jsonify({
+            'success': True,
+            'questions': questions_data,
+            'total_questions': totalquestions,
+            'currentCategory': 'Science',
+            })
+
+    @app.route('/category/<int:id>/questions')
+    def retrieve_questionsByCategory(id):
+        current_category = categories.get(id + 1)
+        if current_category is None:
             abort(422)
 
-        start = 10 * (page - 1)
-        end = start + 10
+        questions_query = Question.query.filter(Question.category == id
+                + 1)
 
-        if len(questions_data[start:end]) == 0:
+        if streaming_requested():
+            questions = \
+                iter_formatted(questions_query.order_by(Question.id))
+            return stream_response({'success': True,
+                                   'current_category': current_category},
+                                   'questions', questions, lambda: \
+                                   {'total_questions': question_counts.get(('category'
+                                   , id + 1), questions_query.count)})
+
+        (questions, next_cursor) = paginate(questions_query, Question.id,
+                page_size())
+        questions_data = [question.format() for question in questions]
+
+        if len(questions_data) == 0:
             abort(404)
 
-        totalquestions = len(questions)
+        totalquestions = question_counts.get(('category', id + 1),
+                questions_query.count)
 
         return jsonify({
             'success': True,
-            'questions': questions_data[start:end],
+            'questions': questions_data,
             'total_questions': totalquestions,
             'current_category': current_category,
+            'next_cursor': next_cursor,
             })
 
+    def quiz_category_id(quiz_category):
+        if quiz_category['type'] == 'click':
+            return None
+        return int(quiz_category['id']) + 1
+
     @app.route('/quizzes', methods=['POST'])
     def take_quiz():
 
@@ -163,32 +297,57 @@ def create_app(test_config=None):
             previous_questions = body.get('previous_questions', None)
             quiz_category = body.get('quiz_category', None)
 
-            if quiz_category['type'] == 'click':
-                questions = Question.query.all()
-            else:
-                questions = \
-                    Question.query.filter_by(category=int(quiz_category['id'
-                        ]) + 1).order_by(Question.id).all()
-
-            questions_data = [question.format() for question in
-                              questions]
+            seen = set(previous_questions)
+            category = quiz_category_id(quiz_category)
 
-            listx = questions_data.copy()
-            for i in questions_data:
-                for j in previous_questions:
-                    if i['id'] == j:
-                        listx.remove(i)
+            question = question_index.pick(category, seen)
 
-            if len(listx) == 0:
+            if question is None:
                 return jsonify({'success': True})
 
-            num1 = random.randint(0, len(listx) - 1)
-
-            return jsonify({'success': True, 'question': listx[num1]})
+            return jsonify({'success': True,
+                           'question': question.format()})
         except:
 
             abort(422)
 
+    @app.route('/quizzes/sessions', methods=['POST'])
+    def start_quiz_session():
+
+        try:
+            body = request.get_json()
+            category = quiz_category_id(body.get('quiz_category'))
+        except:
+            abort(422)
+
+        (token, total) = quiz_sessions.start(category)
+
+        return jsonify({'success': True, 'session': token,
+                       'total_questions': total})
+
+    @app.route('/quizzes/sessions/<token>/next', methods=['POST'])
+    def next_quiz_question(token):
+        try:
+            question = quiz_sessions.next_question(token)
+        except UnknownSession:
+            abort(404)
+
+        if question is None:
+            return jsonify({'success': True})
+
+        return jsonify({'success': True, 'question': question.format()})
+
+    @app.route('/quizzes/sessions/<token>', methods=['DELETE'])
+    def end_quiz_session(token):
+        quiz_sessions.end(token)
+
+        return jsonify({'success': True, 'deleted': token})
+
+    @app.errorhandler(400)
+    def bad_request(error):
+        return (jsonify({'success': False, 'error': 400,
+                'message': 'bad request'}), 400)
+
     @app.errorhandler(404)
     def not_found(error):
         return (jsonify({'success': False, 'error': 404,
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import csv
+import io
+import json
+from itertools import islice
+
+from models import db, Question
+
+FIELDS = ['question', 'answer', 'category', 'difficulty']
+EXPORT_FIELDS = ['id'] + FIELDS
+
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+
+class ImportAborted(Exception):
+
+    """Raised when the body can't be read to the end, not UTF-8 or
+    malformed CSV. The batches before it are committed, `summary` counts
+    them."""
+
+    def __init__(self, message, summary):
+        Exception.__init__(self, message)
+        self.summary = summary
+
+
+def read_ndjson(lines):
+    """Yields (line number, row) pairs, a row is None when the line
+    isn't a JSON object."""
+
+    for (number, line) in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield (number, (row if isinstance(row, dict) else None))
+
+
+def read_csv(lines):
+    """Yields (line number, row) pairs, the first line holds the column
+    names. Malformed quoting raises csv.Error."""
+
+    reader = csv.DictReader(lines, strict=True)
+    for row in reader:
+        yield (reader.line_num, row)
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+def validate_row(row, category_exists):
+    """Returns the row as insertable values, or raises ValueError.
+
+    `category` is the category's database id, the one questions are
+    exported with, not the zero-based index POST /questions takes from
+    the frontend."""
+
+    if row is None:
+        raise ValueError('not a JSON object')
+
+    question = row.get('question')
+    answer = row.get('answer')
+    if not isinstance(question, str) or not question.strip():
+        raise ValueError('question is required')
+    if not isinstance(answer, str) or not answer.strip():
+        raise ValueError('answer is required')
+
+    try:
+        category = int(row.get('category'))
+        difficulty = int(row.get('difficulty'))
+    except (TypeError, ValueError):
+        raise ValueError('category and difficulty must be integers')
+
+    if not category_exists(category):
+        raise ValueError('unknown category %d' % category)
+    if not MIN_DIFFICULTY <= difficulty <= MAX_DIFFICULTY:
+        raise ValueError('difficulty must be between %d and %d'
+                         % (MIN_DIFFICULTY, MAX_DIFFICULTY))
+
+    return {
+        'question': question.strip(),
+        'answer': answer.strip(),
+        'category': category,
+        'difficulty': difficulty,
+        }
+
+
+def import_questions(rows, category_exists, batch_size=BATCH_SIZE):
+    """Validates and inserts `rows`, (line number, row) pairs, one
+    transaction per batch.
+
+    Invalid rows are skipped and reported, valid rows are written with
+    COPY on PostgreSQL and an executemany INSERT otherwise. Returns a
+    summary of the import, or raises ImportAborted with the summary of
+    the committed batches when `rows` can't be read to the end."""
+
+    summary = {'imported': 0, 'rejected': 0, 'errors': []}
+    rows = iter(rows)
+
+    while True:
+        try:
+            batch = list(islice(rows, batch_size))
+        except (csv.Error, ValueError) as error:
+            raise ImportAborted(str(error), summary)
+        if len(batch) == 0:
+            break
+
+        values = []
+        for (number, row) in batch:
+            try:
+                values.append(validate_row(row, category_exists))
+            except ValueError as error:
+                summary['rejected'] += 1
+                if len(summary['errors']) < MAX_REPORTED_ERRORS:
+                    summary['errors'].append({'line': number,
+                            'error': str(error)})
+
+        if len(values) == 0:
+            continue
+
+        try:
+            insert_batch(values)
+            db.session.commit()
+        except:
+            db.session.rollback()
+            raise
+        summary['imported'] += len(values)
+
+    return summary
+
+
+def insert_batch(values):
+    if db.engine.dialect.name != 'postgresql':
+        db.session.execute(Question.__table__.insert(), values)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=FIELDS)
+    writer.writerows(values)
+    buffer.seek(0)
+
+    cursor = db.session.connection().connection.cursor()
+    try:
+        cursor.copy_expert('COPY questions (%s) FROM STDIN WITH '
+                           '(FORMAT csv)' % ', '.join(FIELDS), buffer)
+    finally:
+        cursor.close()
+
+
+def export_rows(batch_size=BATCH_SIZE):
+    """Yields every question as a dict, ordered by id, streaming them
+    from a server-side cursor instead of loading the table."""
+
+    columns = [getattr(Question, field) for field in EXPORT_FIELDS]
+    query = db.session.query(*columns).order_by(Question.id)
+    query = query.execution_options(stream_results=True)
+    for row in query.yield_per(batch_size):
+        yield dict(zip(EXPORT_FIELDS, row))
+
+
+def export_ndjson(batch_size=BATCH_SIZE):
+    lines = []
+    for row in export_rows(batch_size):
+        lines.append(json.dumps(row) + '\n')
+        if len(lines) >= batch_size:
+            yield ''.join(lines)
+            lines = []
+    yield ''.join(lines)
+
+
+def export_csv(batch_size=BATCH_SIZE):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in export_rows(batch_size):
+        writer.writerow(row)
+        if buffer.tell() >= 65536:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+EXPORTERS = {'ndjson': export_ndjson, 'csv': export_csv}
+MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
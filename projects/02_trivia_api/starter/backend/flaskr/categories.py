@@ -0,0 +1,68 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import threading
+import time
+import weakref
+from collections import namedtuple
+from sqlalchemy import event
+
+from models import Category
+
+CategorySnapshot = namedtuple('CategorySnapshot', ['types', 'by_id'])
+
+# every registry is invalidated when a Category row is written
+_registries = weakref.WeakSet()
+
+
+class CategoryRegistry:
+
+    """Categories loaded once and served from memory, as the ordered
+    list of types and an id -> type map.
+
+    Writes to Category through the ORM invalidate every registry of the
+    process, the TTL only bounds how long a registry can lag behind
+    writes made by other processes."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._snapshot = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        _registries.add(self)
+
+    def types(self):
+        """Returns the category types ordered by id."""
+
+        return self._load().types
+
+    def get(self, category_id):
+        """Returns the type of the category `category_id`, or None."""
+
+        return self._load().by_id.get(category_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+    def _load(self):
+        snapshot = self._snapshot
+        if snapshot is not None and self._expires_at > time.monotonic():
+            return snapshot
+
+        categories = Category.query.order_by(Category.id).all()
+        snapshot = CategorySnapshot([category.type for category in
+                                    categories], dict((category.id,
+                                    category.type) for category in
+                                    categories))
+        with self._lock:
+            self._snapshot = snapshot
+            self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+@event.listens_for(Category, 'after_delete')
+def categories_changed(mapper, connection, target):
+    for registry in list(_registries):
+        registry.invalidate()
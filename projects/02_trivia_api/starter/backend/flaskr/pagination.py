@@ -0,0 +1,101 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+from flask import request, abort
+
+QUESTIONS_PER_PAGE = 10
+MAX_QUESTIONS_PER_PAGE = int(os.getenv('MAX_QUESTIONS_PER_PAGE', 100))
+
+
+def page_size():
+    """Reads the requested page size, defaulting to QUESTIONS_PER_PAGE
+    and capped at MAX_QUESTIONS_PER_PAGE."""
+
+    per_page = request.args.get('per_page', QUESTIONS_PER_PAGE,
+                                type=int)
+    if per_page < 1:
+        abort(400)
+    return min(per_page, MAX_QUESTIONS_PER_PAGE)
+
+
+def encode_cursor(last_id):
+    raw = json.dumps({'after': last_id}).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode((cursor + padding).encode('ascii'))
+        after = json.loads(raw.decode('utf-8'))['after']
+    except (binascii.Error, ValueError, KeyError, TypeError,
+            UnicodeError):
+        abort(400)
+    if not isinstance(after, int):
+        abort(400)
+    return after
+
+
+def paginate(query, column, per_page):
+    """Fetches one page of `query` ordered by the unique `column`.
+
+    With a `cursor` argument the page starts right after the row the
+    cursor points to (keyset pagination), otherwise the `page` argument
+    is turned into an OFFSET. One extra row is fetched to know whether a
+    next page exists. Returns the rows and the cursor of the next page,
+    or None on the last page.
+    """
+
+    cursor = request.args.get('cursor')
+    query = query.order_by(column)
+    if cursor:
+        query = query.filter(column > decode_cursor(cursor))
+    else:
+        page = request.args.get('page', 1, type=int)
+        if page < 1:
+            abort(400)
+        query = query.offset((page - 1) * per_page)
+
+    rows = query.limit(per_page + 1).all()
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        return (rows, encode_cursor(getattr(rows[-1], column.key)))
+    return (rows, None)
+
+
+class CountCache:
+
+    """Caches COUNT(*) results per key for `ttl` seconds.
+
+    Write paths invalidate the keys they affect, the TTL only bounds how
+    long a count can lag behind writes made by other processes."""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, count):
+        """Returns the cached count for `key`, calling `count()` to
+        compute it when missing or expired."""
+
+        cached = self._counts.get(key)
+        if cached is not None and cached[1] > time.monotonic():
+            return cached[0]
+
+        value = count()
+        with self._lock:
+            self._counts[key] = (value, time.monotonic() + self.ttl)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            if key is None:
+                self._counts.clear()
+            else:
+                self._counts.pop(key, None)
@@ -0,0 +1,87 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import random
+import threading
+import time
+
+from models import db, Question
+
+# random draws tried before falling back to listing the unseen ids
+MAX_DRAWS = 16
+
+
+class QuestionIndex:
+
+    """In-memory arrays of question ids, for the whole bank and per
+    category, used to draw quiz questions without scanning the table.
+
+    Write paths call `invalidate()`, the TTL only bounds how long the
+    index can lag behind writes made by other processes."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._ids = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def ids(self, category=None):
+        """Returns the ids of the questions in `category`, or of every
+        question when `category` is None."""
+
+        ids = self._ids
+        if ids is None or self._expires_at <= time.monotonic():
+            ids = self._load()
+        return ids.get(category, [])
+
+    def invalidate(self):
+        with self._lock:
+            self._ids = None
+
+    def pick(self, category=None, seen=frozenset()):
+        """Returns a random question of `category` whose id is not in the
+        `seen` set, or None when every question was already seen."""
+
+        for attempt in range(2):
+            question_id = self._draw(self.ids(category), seen)
+            if question_id is None:
+                return None
+
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+
+            # deleted by another process since the index was loaded
+            self.invalidate()
+        return None
+
+    def _draw(self, ids, seen):
+        if len(ids) == 0:
+            return None
+
+        # cheap while most of the category is unseen, which is the
+        # usual case even for long sessions on a large bank
+        for draw in range(MAX_DRAWS):
+            question_id = random.choice(ids)
+            if question_id not in seen:
+                return question_id
+
+        unseen = [question_id for question_id in ids if question_id
+                  not in seen]
+        if len(unseen) == 0:
+            return None
+        return random.choice(unseen)
+
+    def _load(self):
+        rows = db.session.query(Question.id,
+                                Question.category).order_by(Question.id)
+
+        ids = {None: []}
+        for (question_id, category) in rows:
+            ids[None].append(question_id)
+            if category is not None:
+                ids.setdefault(int(category), []).append(question_id)
+
+        with self._lock:
+            self._ids = ids
+            self._expires_at = time.monotonic() + self.ttl
+        return ids
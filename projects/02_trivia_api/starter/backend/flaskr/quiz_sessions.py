@@ -0,0 +1,144 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import random
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from models import Question
+
+# ids pushed per Redis command when a deck is stored
+REDIS_CHUNK_SIZE = 10000
+
+
+class UnknownSession(KeyError):
+
+    """The quiz session doesn't exist or has expired."""
+
+
+class MemorySessionStore:
+
+    """In-process LRU of quiz decks, each expiring `ttl` seconds after
+    its last use."""
+
+    def __init__(self, ttl=3600, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._decks = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, token, deck):
+        # reversed so that drawing is a pop() from the end of the list
+        deck = list(reversed(deck))
+        with self._lock:
+            self._decks[token] = [deck, time.monotonic() + self.ttl]
+            while len(self._decks) > self.maxsize:
+                self._decks.popitem(last=False)
+
+    def pop(self, token):
+        """Returns the next question id of the deck, or None once the
+        deck is exhausted."""
+
+        with self._lock:
+            entry = self._decks.get(token)
+            if entry is None or entry[1] <= time.monotonic():
+                self._decks.pop(token, None)
+                raise UnknownSession(token)
+
+            self._decks.move_to_end(token)
+            entry[1] = time.monotonic() + self.ttl
+            return (entry[0].pop() if entry[0] else None)
+
+    def delete(self, token):
+        with self._lock:
+            self._decks.pop(token, None)
+
+
+class RedisSessionStore:
+
+    """Quiz decks held in Redis lists, shared by every process.
+
+    `client` is a redis-py compatible client, e.g. `redis.Redis` or a
+    local stand-in such as `fakeredis.FakeRedis`."""
+
+    def __init__(self, client, ttl=3600, prefix='trivia:quiz:'):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def create(self, token, deck):
+        pipeline = self.client.pipeline()
+        pipeline.set(self._key(token, 'session'), 1, ex=self.ttl)
+        for start in range(0, len(deck), REDIS_CHUNK_SIZE):
+            pipeline.rpush(self._key(token, 'deck'), *deck[start:start
+                           + REDIS_CHUNK_SIZE])
+        pipeline.expire(self._key(token, 'deck'), self.ttl)
+        pipeline.execute()
+
+    def pop(self, token):
+        pipeline = self.client.pipeline()
+        pipeline.expire(self._key(token, 'session'), self.ttl)
+        pipeline.lpop(self._key(token, 'deck'))
+        pipeline.expire(self._key(token, 'deck'), self.ttl)
+        (exists, question_id, _) = pipeline.execute()
+
+        if not exists:
+            raise UnknownSession(token)
+        return (int(question_id) if question_id is not None else None)
+
+    def delete(self, token):
+        self.client.delete(self._key(token, 'session'), self._key(token,
+                           'deck'))
+
+    def _key(self, token, name):
+        return self.prefix + token + ':' + name
+
+
+def create_session_store(url=None, ttl=3600, maxsize=10000):
+    """Builds the store configured by `url`: 'memory' (the default) or
+    a redis:// URL, which needs the optional redis package."""
+
+    if not url or url == 'memory':
+        return MemorySessionStore(ttl=ttl, maxsize=maxsize)
+
+    import redis
+    return RedisSessionStore(redis.Redis.from_url(url), ttl=ttl)
+
+
+class QuizSessions:
+
+    """Quiz sessions holding a pre-shuffled deck of question ids, so that
+    each round costs the same however long the game lasts."""
+
+    def __init__(self, store, question_index):
+        self.store = store
+        self.question_index = question_index
+
+    def start(self, category=None):
+        """Starts a session over `category` (every question when None)
+        and returns its token and the number of questions."""
+
+        deck = list(self.question_index.ids(category))
+        random.shuffle(deck)
+
+        token = secrets.token_urlsafe(16)
+        self.store.create(token, deck)
+        return (token, len(deck))
+
+    def next_question(self, token):
+        """Returns the next question of the session, or None when every
+        question was asked. Raises UnknownSession."""
+
+        while True:
+            question_id = self.store.pop(token)
+            if question_id is None:
+                return None
+
+            # skips the questions deleted since the session started
+            question = Question.query.get(question_id)
+            if question is not None:
+                return question
+
+    def end(self, token):
+        self.store.delete(token)
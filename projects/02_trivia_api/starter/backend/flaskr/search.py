@@ -0,0 +1,196 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import re
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import func, inspect, literal_column
+
+from models import db, Question
+
+# no stemming or stopwords, so that PostgreSQL matches the words the
+# in-memory index does, the migration bdad230ab1c1 indexes with it too
+SEARCH_CONFIG = 'simple'
+
+# weight of an answer hit relative to a question hit, for the in-memory
+# index, PostgreSQL uses the default weights of the A and B labels
+ANSWER_WEIGHT = 0.4
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text):
+    return [word.lower() for word in WORD.findall(text or '')]
+
+
+def tsquery_text(words, search_answers):
+    """Builds a to_tsquery() expression matching every word as a prefix,
+    restricted to the question's weight unless answers are searched."""
+
+    weights = ('AB' if search_answers else 'A')
+    return ' & '.join(word + ':*' + weights for word in words)
+
+
+class InvertedIndex:
+
+    """In-process inverted index over question and answer words, used
+    when the database has no full-text search (SQLite tests)."""
+
+    def __init__(self, rows):
+        self.questions = {}
+        self.answers = {}
+        for (question_id, question, answer) in rows:
+            for word in tokenize(question):
+                postings = self.questions.setdefault(word, {})
+                postings[question_id] = postings.get(question_id, 0) + 1
+            for word in tokenize(answer):
+                postings = self.answers.setdefault(word, {})
+                postings[question_id] = postings.get(question_id, 0) + 1
+        self.vocabulary = sorted(set(self.questions) | set(self.answers))
+
+    def expand(self, prefix):
+        """Yields the indexed words starting with `prefix`."""
+
+        position = bisect_left(self.vocabulary, prefix)
+        while position < len(self.vocabulary) \
+            and self.vocabulary[position].startswith(prefix):
+            yield self.vocabulary[position]
+            position += 1
+
+    def search(self, words, search_answers=False):
+        """Returns the ids of the questions matching every word, best
+        ranked first."""
+
+        scores = None
+        for word in words:
+            word_scores = {}
+            for indexed_word in self.expand(word):
+                for (question_id, count) in self.questions.get(indexed_word,
+                        {}).items():
+                    word_scores[question_id] = word_scores.get(question_id,
+                            0) + count
+                if not search_answers:
+                    continue
+                for (question_id, count) in self.answers.get(indexed_word,
+                        {}).items():
+                    word_scores[question_id] = word_scores.get(question_id,
+                            0) + count * ANSWER_WEIGHT
+
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = dict((question_id, scores[question_id] + score)
+                              for (question_id, score) in
+                              word_scores.items() if question_id in scores)
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda question_id: (-scores[question_id],
+                      question_id))
+
+
+class QuestionSearch:
+
+    """Ranked, paginated question search.
+
+    Uses the `search_vector` column and its GIN index on PostgreSQL once
+    the migration has been applied, and an in-process inverted index
+    otherwise. The inverted index is rebuilt after `invalidate()` or
+    `ttl` seconds."""
+
+    def __init__(self, ttl=300):
+        self.ttl = ttl
+        self._full_text = None
+        self._index = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def search(self, term, search_answers=False, offset=0, limit=10):
+        """Returns a page of the matching questions and the total number
+        of matches. An empty term matches every question."""
+
+        words = tokenize(term)
+        if len(words) == 0:
+            query = Question.query
+            return (query.order_by(Question.id).offset(offset).limit(limit).all(),
+                    query.count())
+
+        if self.full_text():
+            return self._search_full_text(words, search_answers, offset,
+                    limit)
+        return self._search_index(words, search_answers, offset, limit)
+
+    def iter_search(self, term, search_answers=False, batch_size=500):
+        """Yields every matching question, best ranked first, fetching
+        `batch_size` rows at a time instead of materializing them."""
+
+        words = tokenize(term)
+        if len(words) == 0:
+            query = Question.query.order_by(Question.id)
+        elif self.full_text():
+            query = self._full_text_query(words, search_answers)
+        else:
+            ranked = self._load().search(words, search_answers)
+            for start in range(0, len(ranked), batch_size):
+                for question in self._fetch(ranked[start:start
+                        + batch_size]):
+                    yield question
+            return
+
+        query = query.execution_options(stream_results=True)
+        for question in query.yield_per(batch_size):
+            yield question
+
+    def full_text(self):
+        if self._full_text is None:
+            self._full_text = db.engine.dialect.name == 'postgresql' \
+                and 'search_vector' in [column['name'] for column in
+                    inspect(db.engine).get_columns('questions')]
+        return self._full_text
+
+    def invalidate(self):
+        with self._lock:
+            self._index = None
+
+    def _full_text_query(self, words, search_answers):
+        """Returns the query of the matches, best ranked first."""
+
+        vector = literal_column('questions.search_vector')
+        tsquery = func.to_tsquery(SEARCH_CONFIG, tsquery_text(words,
+                                  search_answers))
+        matches = Question.query.filter(vector.op('@@')(tsquery))
+        return matches.order_by(func.ts_rank(vector, tsquery).desc(),
+                                Question.id)
+
+    def _search_full_text(self, words, search_answers, offset, limit):
+        ranked = self._full_text_query(words, search_answers)
+        questions = ranked.offset(offset).limit(limit).all()
+        return (questions, ranked.order_by(None).count())
+
+    def _search_index(self, words, search_answers, offset, limit):
+        ranked = self._load().search(words, search_answers)
+        return (self._fetch(ranked[offset:offset + limit]), len(ranked))
+
+    def _fetch(self, question_ids):
+        """Loads the questions `question_ids`, in that order."""
+
+        if len(question_ids) == 0:
+            return []
+
+        questions = dict((question.id, question) for question in
+                         Question.query.filter(Question.id.in_(question_ids)))
+        return [questions[question_id] for question_id in question_ids
+                if question_id in questions]
+
+    def _load(self):
+        index = self._index
+        if index is not None and self._expires_at > time.monotonic():
+            return index
+
+        rows = db.session.query(Question.id, Question.question,
+                                Question.answer)
+        index = InvertedIndex(rows)
+        with self._lock:
+            self._index = index
+            self._expires_at = time.monotonic() + self.ttl
+        return index
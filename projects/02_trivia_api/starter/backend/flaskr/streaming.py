@@ -0,0 +1,73 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+import json
+from flask import Response, request, stream_with_context
+
+# items encoded per chunk written to the response
+CHUNK_SIZE = 100
+YIELD_PER = 500
+
+
+def streaming_requested():
+    """Streaming is opt-in, with a `stream=true` query parameter."""
+
+    return request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+
+def iter_formatted(query, batch_size=YIELD_PER):
+    """Yields `format()` of every row of `query`, fetching `batch_size`
+    rows at a time from a server-side cursor."""
+
+    query = query.execution_options(stream_results=True)
+    for row in query.yield_per(batch_size):
+        yield row.format()
+
+
+def encode_members(members):
+    return ', '.join(json.dumps(key) + ': ' + json.dumps(value)
+                     for (key, value) in members.items())
+
+
+def stream_json(envelope, key, items, trailer=None):
+    """Yields the JSON object `envelope` with the `items` iterable
+    encoded incrementally as its `key` list.
+
+    `trailer` is called once the items are exhausted and returns members
+    written after the list, for values only known at the end such as the
+    number of items."""
+
+    head = encode_members(envelope)
+    yield '{' + head + (', ' if head else '') + json.dumps(key) + ': ['
+
+    chunk = []
+    separator = ''
+    for item in items:
+        chunk.append(json.dumps(item))
+        if len(chunk) >= CHUNK_SIZE:
+            yield separator + ', '.join(chunk)
+            separator = ', '
+            chunk = []
+    if chunk:
+        yield separator + ', '.join(chunk)
+
+    tail = (encode_members(trailer()) if trailer is not None else '')
+    yield ']' + (', ' + tail if tail else '') + '}'
+
+
+def stream_response(envelope, key, items, trailer=None):
+    return Response(stream_with_context(stream_json(envelope, key, items,
+                    trailer)), mimetype='application/json')
+
+
+class Counter:
+
+    """Counts the items passing through an iterable."""
+
+    def __init__(self, items):
+        self.items = items
+        self.count = 0
+
+    def __iter__(self):
+        for item in self.items:
+            self.count += 1
+            yield item
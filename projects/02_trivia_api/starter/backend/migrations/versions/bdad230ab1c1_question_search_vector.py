@@ -0,0 +1,42 @@
+"""question full-text search vector
+
+Revision ID: bdad230ab1c1
+Revises:
+Create Date: 2026-10-18 10:12:40.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bdad230ab1c1'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# the base schema comes from trivia.psql (or db.create_all), this
+# revision only adds the PostgreSQL full-text search column and index. It
+# uses the 'simple' configuration of flaskr.search.SEARCH_CONFIG
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("""
+        ALTER TABLE questions ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(question, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(answer, '')), 'B')
+        ) STORED
+    """)
+    op.create_index('ix_questions_search_vector', 'questions',
+                    ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_questions_search_vector', table_name='questions')
+    op.drop_column('questions', 'search_vector')
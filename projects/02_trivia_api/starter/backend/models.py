@@ -1,8 +1,10 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 import os
-from sqlalchemy import Column, String, Integer, create_engine
+from sqlalchemy import Column, String, Integer, ForeignKey, Index, \
+    create_engine
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate
 from dotenv import load_dotenv
 import json
 
@@ -13,6 +15,7 @@ database_path = \
     'postgres://postgres:{}@{}/{}'.format(os.getenv('DATABASE_PASSWORD'
         ), 'localhost:5432', database_name)
 db = SQLAlchemy()
+migrate = Migrate()
 
 
 def setup_db(app, database_path=database_path):
@@ -20,17 +23,22 @@ def setup_db(app, database_path=database_path):
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
     db.app = app
     db.init_app(app)
+    migrate.init_app(app, db)
     db.create_all()
 
 
 class Question(db.Model):
 
     __tablename__ = 'questions'
+    __table_args__ = (Index('ix_questions_category_id', 'category', 'id'
+                      ), )
 
     id = Column(Integer, primary_key=True)
     question = Column(String)
     answer = Column(String)
-    category = Column(String)
+    category = Column(Integer, ForeignKey('categories.id',
+                      name='category', onupdate='CASCADE',
+                      ondelete='SET NULL'))
     difficulty = Column(Integer)
 
     def __init__(
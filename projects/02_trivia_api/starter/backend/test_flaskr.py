@@ -6,6 +6,7 @@ import json
 from flask_sqlalchemy import SQLAlchemy
 
 from flaskr import create_app
+from flaskr.search import QuestionSearch, tokenize
 from models import setup_db, Question, Category
 from dotenv import load_dotenv
 import json
@@ -78,6 +79,36 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'Not found')
 
+    def test_get_questions_per_page(self):
+        res = self.client().get('/questions?page=1&per_page=2')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(len(data['questions']), 2)
+        self.assertTrue(data['total_questions'])
+
+    def test_get_questions_with_cursor(self):
+        res = self.client().get('/questions?per_page=2')
+        first_page = json.loads(res.data)
+
+        res = self.client().get('/questions?per_page=2&cursor='
+                                + first_page['next_cursor'])
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertGreater(data['questions'][0]['id'],
+                           first_page['questions'][-1]['id'])
+
+    def test_400_invalid_cursor(self):
+        res = self.client().get('/questions?cursor=invalid')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+
     def test_search(self):
         x = '{"searchTerm":"title"}'
         res = self.client().post('/questions/search',
@@ -86,6 +117,51 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_search_paginated(self):
+        res = self.client().post('/questions/search?per_page=1',
+                                 json={'searchTerm': 'soccer'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(len(data['questions']), 1)
+        self.assertGreater(data['total_questions'], 1)
+
+    def test_search_backends_agree(self):
+        with self.app.app_context():
+            search = QuestionSearch()
+            for term in ['what', 'soccer', 'the liver']:
+                (questions, total) = search._search_index(tokenize(term),
+                        True, 0, 100)
+                self.assertTrue(total)
+                if search.full_text():
+                    (matches, full_text_total) = \
+                        search._search_full_text(tokenize(term), True, 0,
+                            100)
+                    self.assertEqual(full_text_total, total)
+                    self.assertEqual(set(question.id for question in
+                            matches), set(question.id for question in
+                            questions))
+
+    def test_search_answers(self):
+        res = self.client().post('/questions/search',
+                                 json={'searchTerm': 'Escher',
+                                 'searchAnswers': True})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertTrue(data['total_questions'])
+
+    def test_search_streamed(self):
+        res = self.client().post('/questions/search?stream=true',
+                                 json={'searchTerm': 'what'})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(len(data['questions']), data['total_questions'])
+
     def test_questions_by_category(self):
         res = self.client().get('/category/1/questions')
         data = json.loads(res.data)
@@ -93,6 +169,16 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_questions_by_category_paginated(self):
+        res = self.client().get('/category/0/questions?per_page=1')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(data['questions']), 1)
+        self.assertGreater(data['total_questions'], 1)
+        self.assertTrue(data['next_cursor'])
+        self.assertEqual(data['questions'][0]['category'], 1)
+
     def test_404_questions_by_category_failue(self):
         res = self.client().get('/category/100/questions')
         data = json.loads(res.data)
@@ -125,6 +211,53 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(res.status_code, 200)
         self.assertEqual(data['success'], True)
 
+    def test_quiz_skips_previous_questions(self):
+        res = self.client().get('/category/0/questions')
+        category_questions = json.loads(res.data)['questions']
+        previous_questions = [question['id'] for question in
+                              category_questions[1:]]
+
+        res = self.client().post('/quizzes',
+                                 json={'previous_questions': previous_questions,
+                                 'quiz_category': {'type': 'Science', 'id': 0}})
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['question']['id'], category_questions[0]['id'])
+
+    def test_quiz_session(self):
+        res = self.client().post('/quizzes/sessions',
+                                 json={'quiz_category': {'type': 'Science',
+                                 'id': 0}})
+        data = json.loads(res.data)
+        token = data['session']
+        total = data['total_questions']
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+
+        asked = set()
+        for round in range(total):
+            res = self.client().post('/quizzes/sessions/%s/next' % token)
+            question = json.loads(res.data)['question']
+            self.assertEqual(question['category'], 1)
+            asked.add(question['id'])
+
+        res = self.client().post('/quizzes/sessions/%s/next' % token)
+        data = json.loads(res.data)
+
+        self.assertEqual(data['success'], True)
+        self.assertEqual(len(asked), total)
+        self.assertTrue('question' not in data)
+
+    def test_404_unknown_quiz_session(self):
+        res = self.client().post('/quizzes/sessions/unknown/next')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 404)
+        self.assertEqual(data['success'], False)
+
     def test_404_taking_quiz_failure(self):
         res = self.client().post('/quizzes')
         data = json.loads(res.data)
@@ -132,6 +265,50 @@ class TriviaTestCase(unittest.TestCase):
         self.assertEqual(data['success'], False)
         self.assertEqual(data['message'], 'unprocessable')
 
+    def test_bulk_import_questions(self):
+        rows = [json.dumps(dict(self.new_question, category=1)),
+                '{"question": "no answer"}']
+        res = self.client().post('/questions/bulk', data='\n'.join(rows),
+                                 content_type='application/x-ndjson')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(data['success'], True)
+        self.assertEqual(data['imported'], 1)
+        self.assertEqual(data['rejected'], 1)
+        self.assertEqual(data['errors'][0]['line'], 2)
+
+    def test_400_bulk_import_malformed_csv(self):
+        body = 'question,answer,category,difficulty\n"unterminated,a,1,1\n'
+        res = self.client().post('/questions/bulk', data=body,
+                                 content_type='text/csv')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['message'], 'bad request')
+        self.assertEqual(data['imported'], 0)
+
+    def test_400_bulk_import_reports_committed_batches(self):
+        lines = ['question,answer,category,difficulty']
+        lines += ['bulk question %d,answer,1,1' % i for i in range(1000)]
+        lines += ['"unterminated,a,1,1']
+        res = self.client().post('/questions/bulk', data='\n'.join(lines),
+                                 content_type='text/csv')
+        data = json.loads(res.data)
+
+        self.assertEqual(res.status_code, 400)
+        self.assertEqual(data['success'], False)
+        self.assertEqual(data['imported'], 1000)
+
+    def test_export_questions(self):
+        res = self.client().get('/questions/export?format=csv')
+        lines = res.data.decode('utf-8').splitlines()
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(lines[0], 'id,question,answer,category,difficulty')
+        self.assertTrue(len(lines) > 1)
+
     def test_create_question(self):
         res = self.client().post('/questions', json=self.new_question)
         data = json.loads(res.data)
@@ -0,0 +1,102 @@
+"""Micro-benchmark for `requires_auth` token verification.
+
+Signs a token with a throwaway RSA key, serves the matching JWKS from a
+local stub server and compares the per request cost of a cold
+verification (full RS256 check) with a warm one (verified token cache hit).
+
+Run from the backend directory:
+
+    python bench_auth.py [iterations]
+"""
+
+import base64
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Crypto.PublicKey import RSA
+from flask import Flask
+from jose import jwt
+
+from src.auth import auth
+from src.auth.jwks import JWKSCache
+
+KID = 'bench'
+
+
+def b64_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def start_jwks_server(key):
+    body = json.dumps({'keys': [{
+        'kty': 'RSA',
+        'kid': KID,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': b64_uint(key.n),
+        'e': b64_uint(key.e),
+        }]}).encode('utf-8')
+
+    class JWKSHandler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = HTTPServer(('127.0.0.1', 0), JWKSHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run(iterations):
+    key = RSA.generate(2048)
+    server = start_jwks_server(key)
+    auth.jwks_cache = JWKSCache('http://127.0.0.1:%d/.well-known/jwks.json'
+                                % server.server_port)
+
+    token = jwt.encode({
+        'iss': 'https://' + auth.AUTH0_DOMAIN + '/',
+        'aud': auth.API_AUDIENCE,
+        'exp': int(time.time()) + 3600,
+        'permissions': ['get:drinks-detail', 'post:drinks'],
+        }, key.export_key().decode('ascii'), algorithm='RS256',
+        headers={'kid': KID})
+
+    app = Flask(__name__)
+
+    @auth.requires_auth('get:drinks-detail')
+    def view(payload):
+        return payload
+
+    def per_request(clear_cache):
+        with app.test_request_context(headers={'Authorization': 'Bearer '
+                                      + token}):
+            view()  # warm up the JWKS cache
+            start = time.perf_counter()
+            for _ in range(iterations):
+                if clear_cache:
+                    auth.token_cache.clear()
+                view()
+            return (time.perf_counter() - start) / iterations
+
+    cold = per_request(clear_cache=True)
+    warm = per_request(clear_cache=False)
+    server.shutdown()
+
+    print('iterations: %d' % iterations)
+    print('cold verification: %8.1f us/request' % (cold * 1e6))
+    print('warm verification: %8.1f us/request' % (warm * 1e6))
+    print('speedup:           %8.1fx' % (cold / warm))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -4,14 +4,82 @@ from sqlalchemy import exc
 import json
 from flask_cors import CORS
 
-from .database.models import db_drop_and_create_all, setup_db, Drink
+from .database.models import db_create_all, db_drop_and_create_all, \
+    setup_db, database_file, Drink
 from .auth.auth import AuthError, requires_auth
+from .cache import VersionedResponseCache
 
 app = Flask(__name__)
 setup_db(app)
 CORS(app)
 
-db_drop_and_create_all()
+# bumped by every write to the drinks table, the stamp file lets the
+# other workers sharing database.db notice it
+drinks_cache = VersionedResponseCache(stamp_path=database_file
+                                      + '-version')
+
+# DB_STARTUP_MODE picks what each worker does with the schema on start:
+#   create - create the missing tables, keep the data (default)
+#   none   - leave the schema alone
+#   reset  - drop and recreate every table, single worker only
+DB_STARTUP_MODE = os.getenv('DB_STARTUP_MODE', 'create')
+
+with app.app_context():
+    if DB_STARTUP_MODE == 'reset':
+        db_drop_and_create_all()
+        drinks_cache.bump()
+    elif DB_STARTUP_MODE == 'create':
+        db_create_all()
+    elif DB_STARTUP_MODE != 'none':
+        raise ValueError('Unknown DB_STARTUP_MODE ' + DB_STARTUP_MODE)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    db_create_all()
+    drinks_cache.bump()
+    print('Created the missing tables.')
+
+
+@app.cli.command('reset-db')
+def reset_db_command():
+    db_drop_and_create_all()
+    drinks_cache.bump()
+    print('Dropped and recreated every table.')
+
+
+def drinks_body(drinks, representation):
+    '''
+    drinks_body(drinks, representation)
+        joins the pre-encoded JSON fragment of each drink into the
+        listing response instead of serializing every row again
+    '''
+    fragments = [drink.to_json(representation) for drink in drinks]
+    body = '{"success": true, "drinks": [' + ', '.join(fragments) + ']}'
+    return body.encode('utf-8')
+
+
+def drinks_response(representation, cache_control):
+    '''
+    drinks_response(representation, cache_control)
+        serves the drinks listing from the versioned cache, answering
+        with a 304 when the client already holds the current ETag
+    '''
+    cached = drinks_cache.get(representation)
+    if cached is None:
+        version = drinks_cache.version
+        drinks = Drink.query.all()
+        cached = drinks_cache.put(representation, version,
+                                  drinks_body(drinks, representation))
+
+    if request.if_none_match.contains(cached.etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(cached.body,
+                                      mimetype='application/json')
+    response.set_etag(cached.etag)
+    response.headers['Cache-Control'] = cache_control
+    return response
 
 
 ## ROUTES
@@ -19,19 +87,13 @@ db_drop_and_create_all()
 @app.route('/drinks')
 def get_drinks():
 
-    drinks = Drink.query.all()
-
-    return jsonify({'success': True, 'drinks': [drink.short()
-                   for drink in drinks]})
+    return drinks_response('short', 'no-cache')
 
 
 @app.route('/drinks-detail')
 @requires_auth('get:drinks-detail')
 def get_drink_detail(payload):
-    drinks = Drink.query.all()
-
-    return jsonify({'success': True, 'drinks': [drink.long()
-                   for drink in drinks]})
+    return drinks_response('long', 'private, no-cache')
 
 
 @app.route('/drinks', methods=['POST'])
@@ -46,6 +108,7 @@ def post_drink(payload):
                   ]))
 
     drink.insert()
+    drinks_cache.bump()
 
     return jsonify({'success': True, 'drinks': [drink.long()]})
 
@@ -68,6 +131,7 @@ def patch_drink(payload, id):
         drink.recipe = json.dumps(body['recipe'])
 
     drink.update()
+    drinks_cache.bump()
 
     return jsonify({'success': True, 'drinks': [drink.long()]})
 
@@ -81,6 +145,7 @@ def delete_drink(payload, id):
         abort(404)
 
     drink.delete()
+    drinks_cache.bump()
 
     return jsonify({'success': True, 'delete': drink.id})
 
@@ -1,13 +1,30 @@
-import json
+import os
 from flask import request, _request_ctx_stack
 from functools import wraps
 from jose import jwt
-from urllib.request import urlopen
+
+from .jwks import JWKSCache
+from .permissions import PermissionMatcher, compile_permission
+from .token_cache import VerifiedTokenCache, verified_token
 
 AUTH0_DOMAIN = 'udacity-amory.us.auth0.com'
 ALGORITHMS = ['RS256']
 API_AUDIENCE = 'udacity'
 
+JWKS_URL = os.getenv('JWKS_URL', 'https://' + AUTH0_DOMAIN
+                     + '/.well-known/jwks.json')
+JWKS_CACHE_TTL = int(os.getenv('JWKS_CACHE_TTL', 600))
+JWKS_MIN_REFRESH_INTERVAL = int(os.getenv('JWKS_MIN_REFRESH_INTERVAL', 30))
+
+jwks_cache = JWKSCache(JWKS_URL, ttl=JWKS_CACHE_TTL,
+                       min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL)
+
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', 1024))
+TOKEN_CACHE_MAX_AGE = int(os.getenv('TOKEN_CACHE_MAX_AGE', 300))
+
+token_cache = VerifiedTokenCache(maxsize=TOKEN_CACHE_SIZE,
+                                 max_age=TOKEN_CACHE_MAX_AGE)
+
 
 ## AuthError Exception
 
@@ -49,38 +66,73 @@ def get_token_auth_header():
     return token
 
 
-def check_permissions(permission, payload):
+PERMISSIONS_MISSING = {'code': 'invalid_claims',
+                       'description': 'Permissions not included in JWT.'}
+PERMISSION_NOT_FOUND = {'code': 'unauthorized',
+                        'description': 'Permission not found.'}
+
+
+def check_permissions(permission, payload, granted=None):
+    """`permission` is either a permission string or a precompiled
+    `PermissionMatcher`, `granted` the token's permissions as a frozenset
+    when it's already known.
+    """
+
     if 'permissions' not in payload:
-        raise AuthError({'code': 'invalid_claims',
-                        'description': 'Permissions not included in JWT.'
-                        }, 400)
+        raise AuthError(PERMISSIONS_MISSING, 400)
+
+    if not isinstance(permission, PermissionMatcher):
+        permission = compile_permission(permission)
+    if granted is None:
+        granted = frozenset(payload['permissions'])
 
-    if permission not in payload['permissions']:
-        raise AuthError({'code': 'unauthorized',
-                        'description': 'Permission not found.'}, 401)
+    if not permission(granted):
+        raise AuthError(PERMISSION_NOT_FOUND, 401)
     return True
 
 
+def get_signing_key(kid):
+    try:
+        return jwks_cache.get_key(kid)
+    except Exception:
+        raise AuthError({'code': 'jwks_unavailable',
+                        'description': 'Unable to fetch the signing keys.'
+                        }, 503)
+
+
 def verify_decode_jwt(token):
-    jsonurl = urlopen('https://' + AUTH0_DOMAIN
-                      + '/.well-known/jwks.json')
-    jwks = json.loads(jsonurl.read())
-    unverified_header = jwt.get_unverified_header(token)
-    rsa_key = {}
+    return verify_token(token).payload
+
+
+def verify_token(token):
+    """Returns the `VerifiedToken` for `token`, from the cache if the
+    same token was already verified and hasn't expired yet.
+    """
+
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
+    payload = decode_jwt(token)
+    return token_cache.put(token, payload) or verified_token(payload)
+
+
+def decode_jwt(token):
+    """Runs the full RS256 verification of `token`, bypassing the cache.
+    """
+
+    try:
+        unverified_header = jwt.get_unverified_header(token)
+    except jwt.JWTError:
+        raise AuthError({'code': 'invalid_header',
+                        'description': 'Unable to parse authentication token.'
+                        }, 400)
     if 'kid' not in unverified_header:
         raise AuthError({'code': 'invalid_header',
                         'description': 'Authorization malformed.'}, 401)
 
-    for key in jwks['keys']:
-        if key['kid'] == unverified_header['kid']:
-            rsa_key = {
-                'kty': key['kty'],
-                'kid': key['kid'],
-                'use': key['use'],
-                'n': key['n'],
-                'e': key['e'],
-                }
-    if rsa_key:
+    rsa_key = get_signing_key(unverified_header['kid'])
+    if rsa_key is not None:
         try:
             payload = jwt.decode(token, rsa_key, algorithms=ALGORITHMS,
                                  audience=API_AUDIENCE,
@@ -106,15 +158,17 @@ def verify_decode_jwt(token):
 
 
 def requires_auth(permission=''):
+    matcher = compile_permission(permission)
 
     def requires_auth_decorator(f):
 
         @wraps(f)
         def wrapper(*args, **kwargs):
             token = get_token_auth_header()
-            payload = verify_decode_jwt(token)
-            check_permissions(permission, payload)
-            return f(payload, *args, **kwargs)
+            verified = verify_token(token)
+            check_permissions(matcher, verified.payload,
+                              verified.permissions)
+            return f(verified.payload, *args, **kwargs)
 
         return wrapper
 
@@ -0,0 +1,129 @@
+import json
+import logging
+import threading
+import time
+from urllib.request import urlopen
+
+from jose import jwk
+
+logger = logging.getLogger(__name__)
+
+
+## JWKS Cache
+
+class JWKSCache:
+    """Process-wide cache of the identity provider's signing keys.
+
+    Keys are fetched from the JWKS endpoint, parsed into public key
+    objects once and indexed by `kid`. Lookups are served from memory:
+    - within `ttl` seconds of the last fetch the cached keys are used as is
+    - after `ttl` the stale keys are still served while a single
+      background thread refreshes them (stale-while-revalidate)
+    - an unknown `kid` triggers one blocking refresh shared by all the
+      threads asking for it, at most once every `min_refresh_interval`
+      seconds so that forged `kid`s can't hammer the provider
+    """
+
+    def __init__(self, url, ttl=600, min_refresh_interval=30, timeout=5):
+        self.url = url
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.timeout = timeout
+
+        self._keys = None
+        self._fetched_at = 0.0
+        self._attempted_at = None
+        self._generation = 0
+        self._revalidating = False
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def get_key(self, kid):
+        """Returns the parsed public key for `kid`, or None if unknown."""
+
+        keys = self._keys
+        if keys is None:
+            self._refresh(self._generation)
+            keys = self._keys
+        elif time.monotonic() - self._fetched_at > self.ttl:
+            self._revalidate()
+
+        key = keys.get(kid)
+        if key is None and self._may_refresh():
+            try:
+                self._refresh(self._generation)
+            except Exception:
+                logger.exception('Unable to refresh JWKS from %s', self.url)
+                return None
+            key = self._keys.get(kid)
+        return key
+
+    def clear(self):
+        with self._refresh_lock:
+            self._keys = None
+            self._fetched_at = 0.0
+            self._attempted_at = None
+            self._generation += 1
+
+    def fetch(self):
+        jsonurl = urlopen(self.url, timeout=self.timeout)
+        return json.loads(jsonurl.read())
+
+    def _may_refresh(self):
+        attempted_at = self._attempted_at
+        return attempted_at is None or \
+            time.monotonic() - attempted_at >= self.min_refresh_interval
+
+    def _refresh(self, generation):
+        with self._refresh_lock:
+            # another thread refreshed the keys while we were waiting
+            if self._generation != generation:
+                return
+
+            self._attempted_at = time.monotonic()
+            keys = parse_jwks(self.fetch())
+            self._keys = keys
+            self._fetched_at = time.monotonic()
+            self._generation += 1
+
+    def _revalidate(self):
+        with self._lock:
+            if self._revalidating or not self._may_refresh():
+                return
+            self._revalidating = True
+
+        thread = threading.Thread(target=self._revalidate_worker,
+                                  args=(self._generation, ), daemon=True)
+        thread.start()
+
+    def _revalidate_worker(self, generation):
+        try:
+            self._refresh(generation)
+        except Exception:
+            logger.exception('Unable to refresh JWKS from %s, serving stale keys'
+                             , self.url)
+        finally:
+            with self._lock:
+                self._revalidating = False
+
+
+def parse_jwks(jwks):
+    """Builds a `kid` -> public key object map from a JWKS document."""
+
+    keys = {}
+    for key in jwks.get('keys', []):
+        if key.get('kty') != 'RSA' or 'kid' not in key:
+            continue
+        if key.get('use', 'sig') != 'sig':
+            continue
+        try:
+            keys[key['kid']] = jwk.construct({
+                'kty': key['kty'],
+                'kid': key['kid'],
+                'use': key.get('use', 'sig'),
+                'n': key['n'],
+                'e': key['e'],
+                }, algorithm=key.get('alg', 'RS256'))
+        except Exception:
+            logger.warning('Skipping unusable JWKS key %s', key['kid'])
+    return keys
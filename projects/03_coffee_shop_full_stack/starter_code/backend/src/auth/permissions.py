@@ -0,0 +1,84 @@
+from functools import lru_cache
+from itertools import product
+
+WILDCARD = '*'
+SEPARATOR = ':'
+RESOURCE_SEPARATORS = '-:'
+
+
+## Permission Matcher
+
+class PermissionMatcher:
+    """Precompiled check for one required permission.
+
+    Permissions are `verb:resource`. A granted scope satisfies one when
+    it is equal to it or when it uses wildcards:
+    - `*:drinks` and `drinks:*` grant every verb on `drinks`
+    - `post:*` grants `post` on every resource
+    - `*` (or `*:*`) grants everything
+    Resource wildcards also cover the resource's sub-resources, whose
+    names extend it after a `-` or `:`, so `drinks:*` grants
+    `get:drinks-detail`. A trailing wildcard covers all the remaining
+    segments, so `post:drinks:*` grants `post:drinks:recipes`.
+
+    Every granted scope that would match is enumerated once, when the
+    matcher is built, so a check is a set intersection whose cost
+    doesn't depend on how many scopes the token carries.
+    """
+
+    __slots__ = ('permission', 'candidates')
+
+    def __init__(self, permission):
+        self.permission = permission
+        self.candidates = frozenset(expand_permission(permission))
+
+    def __call__(self, granted):
+        """`granted` is the frozenset of scopes carried by the token."""
+
+        return not self.candidates.isdisjoint(granted)
+
+    def __repr__(self):
+        return '<PermissionMatcher %r>' % self.permission
+
+
+def resource_ancestors(resource):
+    """Yields `resource` and the resources it is a sub-resource of,
+    e.g. `drinks-detail` and `drinks`."""
+
+    yield resource
+    for position in range(len(resource) - 1, 0, -1):
+        if resource[position] in RESOURCE_SEPARATORS:
+            yield resource[:position]
+
+
+def expand_permission(permission):
+    """Returns every granted scope that satisfies `permission`, once
+    each."""
+
+    segments = permission.split(SEPARATOR)
+    choices = [(segment, WILDCARD) for segment in segments]
+    candidates = []
+
+    def add(candidate):
+        if candidate not in candidates:
+            candidates.append(candidate)
+
+    for combination in product(*choices):
+        add(SEPARATOR.join(combination))
+
+    for length in range(len(segments)):
+        for combination in product(*choices[:length]):
+            add(SEPARATOR.join(combination + (WILDCARD, )))
+
+    if len(segments) > 1:
+        resource = SEPARATOR.join(segments[1:])
+        for ancestor in resource_ancestors(resource):
+            add(WILDCARD + SEPARATOR + ancestor)
+            add(ancestor + SEPARATOR + WILDCARD)
+
+    return candidates
+
+
+@lru_cache(maxsize=256)
+def compile_permission(permission):
+    return PermissionMatcher(permission)
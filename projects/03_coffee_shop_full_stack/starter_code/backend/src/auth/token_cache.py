@@ -0,0 +1,81 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+VerifiedToken = namedtuple('VerifiedToken', ['payload', 'permissions',
+                           'expires_at'])
+
+
+def verified_token(payload, expires_at=None):
+    """Wraps a verified payload, converting its `permissions` claim to a
+    frozenset once so that permission checks don't rescan the list.
+    """
+
+    permissions = payload.get('permissions')
+    if permissions is not None:
+        permissions = frozenset(permissions)
+    return VerifiedToken(payload, permissions, expires_at)
+
+
+## Verified Token Cache
+
+class VerifiedTokenCache:
+    """Bounded LRU of already verified JWT payloads.
+
+    Entries are keyed by the SHA-256 digest of the raw token, so the
+    tokens themselves are never held in memory, and are dropped at the
+    token's `exp` claim (or after `max_age` seconds, whichever comes
+    first). Tokens without an `exp` claim are never cached.
+    """
+
+    def __init__(self, maxsize=1024, max_age=300):
+        self.maxsize = maxsize
+        self.max_age = max_age
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """Returns the cached `VerifiedToken` for `token`, or None."""
+
+        digest = self._digest(token)
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._entries[digest]
+                return None
+            self._entries.move_to_end(digest)
+            return entry
+
+    def put(self, token, payload):
+        """Caches `payload` and returns its `VerifiedToken`, or None if it
+        can't be cached.
+        """
+
+        if self.maxsize <= 0 or 'exp' not in payload:
+            return None
+
+        entry = verified_token(payload, min(payload['exp'], time.time()
+                               + self.max_age))
+        digest = self._digest(token)
+        with self._lock:
+            self._entries[digest] = entry
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _digest(token):
+        if isinstance(token, str):
+            token = token.encode('utf-8')
+        return hashlib.sha256(token).digest()
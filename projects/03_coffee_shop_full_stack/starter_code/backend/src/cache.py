@@ -0,0 +1,92 @@
+import hashlib
+import os
+import threading
+from collections import namedtuple
+
+CachedResponse = namedtuple('CachedResponse', ['version', 'body', 'etag'])
+
+
+## Versioned Response Cache
+
+class VersionedResponseCache:
+    """Serialized response bodies cached per collection version.
+
+    Write paths call `bump()` after they commit, which moves the
+    collection to a new version and drops every cached body. Bodies are
+    stored with a strong ETag derived from their content, so a client
+    holding the current ETag can be answered with a 304 straight from
+    memory.
+
+    When several worker processes share the database, pass a
+    `stamp_path`: `bump()` then also replaces that file and every process
+    moves to a new version as soon as it sees the file change, at the
+    cost of one `stat` per lookup.
+    """
+
+    def __init__(self, stamp_path=None):
+        self.stamp_path = stamp_path
+        self._version = 0
+        self._stamp = None
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._sync()
+
+    @property
+    def version(self):
+        return self._version
+
+    def bump(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self._stamp = self._write_stamp()
+
+    def get(self, key):
+        self._sync()
+        entry = self._entries.get(key)
+        if entry is None or entry.version != self._version:
+            return None
+        return entry
+
+    def put(self, key, version, body):
+        """Caches `body`, built from the collection at `version`.
+
+        `version` must be read before querying the collection: if a write
+        bumped it meanwhile the body may be stale and is returned without
+        being cached.
+        """
+
+        entry = CachedResponse(version, body,
+                               hashlib.sha1(body).hexdigest())
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = entry
+        return entry
+
+    def _sync(self):
+        if self.stamp_path is None:
+            return
+        stamp = self._read_stamp()
+        if stamp == self._stamp:
+            return
+        with self._lock:
+            if stamp != self._stamp:
+                self._version += 1
+                self._entries.clear()
+                self._stamp = stamp
+
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self.stamp_path)
+        except OSError:
+            return None
+        return (stat.st_ino, stat.st_mtime_ns)
+
+    def _write_stamp(self):
+        if self.stamp_path is None:
+            return None
+        tmp_path = '{}.{}'.format(self.stamp_path, os.getpid())
+        with open(tmp_path, 'w') as stamp:
+            stamp.write(str(self._version))
+        os.replace(tmp_path, self.stamp_path)
+        return self._read_stamp()
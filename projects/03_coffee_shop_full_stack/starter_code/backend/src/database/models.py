@@ -1,12 +1,34 @@
 import os
-from sqlalchemy import Column, String, Integer
+import sqlite3
+from functools import lru_cache
+from sqlalchemy import Column, String, Integer, event
+from sqlalchemy.engine import Engine
 from flask_sqlalchemy import SQLAlchemy
 import json
 
 database_filename = 'database.db'
 project_dir = os.path.dirname(os.path.abspath(__file__))
-database_path = 'sqlite:///{}'.format(os.path.join(project_dir,
-        database_filename))
+database_file = os.path.join(project_dir, database_filename)
+database_path = 'sqlite:///{}'.format(database_file)
+
+# shared-cache only helps several connections of the same process and
+# trades row locks for table locks, so it stays opt-in
+if os.getenv('SQLITE_SHARED_CACHE') == '1':
+    database_path = \
+        'sqlite:///file:{}?cache=shared&uri=true'.format(database_file)
+
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+
+# applied to every new connection, the journal mode is persistent but
+# the other settings only last as long as the connection
+SQLITE_PRAGMAS = [
+    'journal_mode=WAL',
+    'synchronous=NORMAL',
+    'busy_timeout={}'.format(SQLITE_BUSY_TIMEOUT),
+    'foreign_keys=ON',
+    'temp_store=MEMORY',
+    'cache_size=-16000',
+    ]
 
 db = SQLAlchemy()
 
@@ -14,15 +36,57 @@ db = SQLAlchemy()
 def setup_db(app):
     app.config['SQLALCHEMY_DATABASE_URI'] = database_path
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT / 1000,
+                         'check_same_thread': False}}
     db.app = app
     db.init_app(app)
 
 
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute('PRAGMA ' + pragma)
+    cursor.close()
+
+
+def db_create_all():
+    '''
+    db_create_all()
+        creates the missing tables, existing tables and rows are kept
+        so it is safe to run on every worker start
+    '''
+    db.create_all()
+
+
 def db_drop_and_create_all():
     db.drop_all()
     db.create_all()
 
 
+# Recipes are parsed and drinks encoded once per distinct value for the
+# whole process, the results are shared and must be treated as read-only
+
+@lru_cache(maxsize=1024)
+def parse_recipe(recipe):
+    return json.loads(recipe)
+
+
+def short_recipe(r):
+    return [{'color': r['color'], 'parts': r['parts']}]
+
+
+@lru_cache(maxsize=4096)
+def encode_drink(representation, id, title, recipe):
+    r = parse_recipe(recipe)
+    if representation == 'short':
+        r = short_recipe(r)
+    return json.dumps({'id': id, 'title': title, 'recipe': r})
+
+
 class Drink(db.Model):
 
     # Autoincrementing, unique primary key
@@ -39,15 +103,28 @@ class Drink(db.Model):
 
     recipe = Column(String(180), nullable=False)
 
+    @property
+    def parsed_recipe(self):
+        parsed = getattr(self, '_parsed_recipe', None)
+        if parsed is None:
+            parsed = self._parsed_recipe = parse_recipe(self.recipe)
+        return parsed
+
     def short(self):
-        r = json.loads(self.recipe)
-        short_recipe = [{'color': r['color'], 'parts': r['parts']}]
         return {'id': self.id, 'title': self.title,
-                'recipe': short_recipe}
+                'recipe': short_recipe(self.parsed_recipe)}
 
     def long(self):
         return {'id': self.id, 'title': self.title,
-                'recipe': json.loads(self.recipe)}
+                'recipe': self.parsed_recipe}
+
+    def to_json(self, representation='short'):
+        '''
+        to_json(representation)
+            the drink encoded as a JSON fragment, 'short' or 'long'
+        '''
+        return encode_drink(representation, self.id, self.title,
+                            self.recipe)
 
     def insert(self):
         db.session.add(self)
@@ -62,3 +139,14 @@ class Drink(db.Model):
 
     def __repr__(self):
         return json.dumps(self.short())
+
+
+@event.listens_for(Drink.recipe, 'set')
+def invalidate_parsed_recipe(target, value, oldvalue, initiator):
+    target._parsed_recipe = None
+
+
+@event.listens_for(Drink, 'expire')
+@event.listens_for(Drink, 'refresh')
+def invalidate_loaded_recipe(target, *args):
+    target._parsed_recipe = None
@@ -0,0 +1,140 @@
+import base64
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from Crypto.PublicKey import RSA
+
+from src.auth.jwks import JWKSCache
+
+
+def b64_uint(value):
+    raw = value.to_bytes((value.bit_length() + 7) // 8, 'big')
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode('ascii')
+
+
+def jwk_of(kid, key):
+    return {
+        'kty': 'RSA',
+        'kid': kid,
+        'use': 'sig',
+        'alg': 'RS256',
+        'n': b64_uint(key.n),
+        'e': b64_uint(key.e),
+        }
+
+
+class StubJWKSServer:
+    """Local JWKS endpoint serving `keys`, or a 500 while `failing`."""
+
+    def __init__(self, keys):
+        self.keys = keys
+        self.failing = False
+        self.requests = 0
+        stub = self
+
+        class JWKSHandler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                stub.requests += 1
+                if stub.failing:
+                    self.send_error(500)
+                    return
+                body = json.dumps({'keys': stub.keys}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = HTTPServer(('127.0.0.1', 0), JWKSHandler)
+        threading.Thread(target=self.server.serve_forever,
+                         daemon=True).start()
+        self.url = 'http://127.0.0.1:%d/.well-known/jwks.json' \
+            % self.server.server_port
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class JWKSCacheTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.first = RSA.generate(2048)
+        cls.second = RSA.generate(2048)
+
+    def setUp(self):
+        self.stub = StubJWKSServer([jwk_of('first', self.first)])
+        self.cache = JWKSCache(self.stub.url, ttl=600,
+                               min_refresh_interval=30)
+
+    def tearDown(self):
+        self.stub.close()
+
+    def expire(self):
+        self.cache._fetched_at -= self.cache.ttl + 1
+        self.cache._attempted_at -= self.cache.min_refresh_interval + 1
+
+    def wait_for_revalidation(self):
+        deadline = time.monotonic() + 5
+        while self.cache._revalidating and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.cache._revalidating)
+
+    def test_keys_served_from_memory_within_ttl(self):
+        self.assertIsNotNone(self.cache.get_key('first'))
+        self.assertIsNotNone(self.cache.get_key('first'))
+        self.assertEqual(self.stub.requests, 1)
+
+    def test_ttl_expiry_refreshes_in_background(self):
+        key = self.cache.get_key('first')
+        self.stub.keys = [jwk_of('second', self.second)]
+        self.expire()
+
+        # the stale key is served while the refresh runs
+        self.assertIs(self.cache.get_key('first'), key)
+        self.wait_for_revalidation()
+        self.assertEqual(self.stub.requests, 2)
+        self.assertIsNotNone(self.cache._keys.get('second'))
+        self.assertIsNone(self.cache._keys.get('first'))
+
+    def test_unknown_kid_refreshes_once(self):
+        self.cache.get_key('first')
+        self.stub.keys = [jwk_of('first', self.first), jwk_of('second',
+                          self.second)]
+        self.cache._attempted_at -= self.cache.min_refresh_interval + 1
+
+        self.assertIsNotNone(self.cache.get_key('second'))
+        self.assertEqual(self.stub.requests, 2)
+
+        # forged kids don't trigger another fetch within the interval
+        self.assertIsNone(self.cache.get_key('forged'))
+        self.assertIsNone(self.cache.get_key('forged'))
+        self.assertEqual(self.stub.requests, 2)
+
+    def test_stale_keys_served_when_upstream_fails(self):
+        key = self.cache.get_key('first')
+        self.stub.failing = True
+        self.expire()
+
+        with self.assertLogs('src.auth.jwks', 'ERROR'):
+            self.assertIs(self.cache.get_key('first'), key)
+            self.wait_for_revalidation()
+        self.assertEqual(self.stub.requests, 2)
+        self.assertIs(self.cache.get_key('first'), key)
+
+        # an unknown kid can't be resolved either, but doesn't raise
+        self.cache._attempted_at -= self.cache.min_refresh_interval + 1
+        with self.assertLogs('src.auth.jwks', 'ERROR'):
+            self.assertIsNone(self.cache.get_key('second'))
+            self.wait_for_revalidation()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+
+from src.auth.permissions import compile_permission, expand_permission
+
+
+def grants(permission, *scopes):
+    return compile_permission(permission)(frozenset(scopes))
+
+
+class PermissionMatcherTestCase(unittest.TestCase):
+
+    def test_exact_grant(self):
+        self.assertTrue(grants('post:drinks', 'post:drinks'))
+        self.assertFalse(grants('post:drinks', 'patch:drinks'))
+        self.assertFalse(grants('get:drinks-detail', 'get:drinks'))
+
+    def test_verb_wildcard_grant(self):
+        self.assertTrue(grants('post:drinks', 'post:*'))
+        self.assertTrue(grants('get:drinks-detail', 'get:*'))
+        self.assertFalse(grants('post:drinks', 'patch:*'))
+
+    def test_resource_wildcard_grant(self):
+        for scope in ('drinks:*', '*:drinks'):
+            self.assertTrue(grants('post:drinks', scope))
+            self.assertTrue(grants('delete:drinks', scope))
+            self.assertTrue(grants('get:drinks-detail', scope))
+        self.assertTrue(grants('get:drinks-detail', 'drinks-detail:*'))
+        self.assertFalse(grants('post:drinks', 'drinks-detail:*'))
+        self.assertFalse(grants('post:drinks', 'recipes:*'))
+
+    def test_global_grant(self):
+        self.assertTrue(grants('post:drinks', '*'))
+        self.assertTrue(grants('get:drinks-detail', '*:*'))
+
+    def test_trailing_wildcard_covers_remaining_segments(self):
+        self.assertTrue(grants('post:drinks:recipes', 'post:drinks:*'))
+        self.assertTrue(grants('post:drinks:recipes', 'drinks:*'))
+        self.assertFalse(grants('post:drinks:recipes', 'post:recipes:*'))
+
+    def test_no_grant(self):
+        self.assertFalse(grants('post:drinks'))
+        self.assertFalse(grants('post:drinks', 'get:drinks-detail'))
+
+    def test_candidates_are_unique(self):
+        for permission in ('post:drinks', 'get:drinks-detail',
+                           'post:drinks:recipes'):
+            candidates = expand_permission(permission)
+            self.assertEqual(len(candidates), len(set(candidates)))
+
+
+if __name__ == '__main__':
+    unittest.main()